@@ -0,0 +1,861 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This is free and unencumbered software released into the public domain.
+
+# Anyone is free to copy, modify, publish, use, compile, sell, or
+# distribute this software, either in source code form or as a compiled
+# binary, for any purpose, commercial or non-commercial, and by any
+# means.
+
+# In jurisdictions that recognize copyright laws, the author or authors
+# of this software dedicate any and all copyright interest in the
+# software to the public domain. We make this dedication for the benefit
+# of the public at large and to the detriment of our heirs and
+# successors. We intend this dedication to be an overt act of
+# relinquishment in perpetuity of all present and future rights to this
+# software under copyright law.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS BE LIABLE FOR ANY CLAIM, DAMAGES OR
+# OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE,
+# ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
+# OTHER DEALINGS IN THE SOFTWARE.
+
+# For more information, please refer to <https://unlicense.org>
+
+"""
+Differential fuzz harness for the `summarize-eaf.py` engines.
+
+Generates random (and deliberately awkward) sets of annotated segments, runs
+them through every engine registered in `ENGINES` and through the frozen
+reference implementation in `eaf_reference.py`, and reports any differences in
+`union_sum`, `section_sums`, the final CSV rows, or the warnings logged, along
+with the speed of each engine relative to the reference. The turn counts of `--turns` are checked
+against a separate computation from the segments.
+"""
+
+from __future__ import print_function
+
+import argparse
+import copy
+import fnmatch
+import logging
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+
+from collections import defaultdict
+from timeit import default_timer as timer
+
+import eaf_reference as reference
+
+# ==============================================================================
+# Load the script under test (its file name isn't a valid module name)
+# ------------------------------------------------------------------------------
+def load_script(name, path):
+    try:
+        import importlib.util
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    except ImportError:
+        import imp
+        module = imp.load_source(name, path)
+    return module
+
+summarize = load_script('summarize_eaf', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'summarize-eaf.py'
+))
+
+# ==============================================================================
+# Engines under test
+# ------------------------------------------------------------------------------
+# Each engine is a name, a set of option overrides applied to the parsed
+# command-line arguments, and a sweep function that takes a list of `Segment`
+# objects for the base tiers and returns `(union_sum, section_sums)`.
+# ------------------------------------------------------------------------------
+def sweep_serial(segments, args):
+    events = summarize.get_events(segments)
+    return summarize.process_events(events,
+                                    masking_tiers = args.mask,
+                                    limiting_tier = args.limiting_tier,
+                                    limiting_annotation_regex = args.limiting_tier_pattern,
+                                    negate_limiting_annotation_regex = args.negate_pattern)
+
+def sweep_pre_clip(segments, args):
+    events = summarize.get_preclipped_events([(s.tier, s) for s in segments],
+                                             masking_tiers = args.mask,
+                                             limiting_tier = args.limiting_tier,
+                                             limiting_annotation_regex = args.limiting_tier_pattern,
+                                             negate_limiting_annotation_regex = args.negate_pattern)
+    preclipped = events is not None
+    if events is None:
+        events = summarize.get_events(segments)
+    if not events:
+        return 0, {}
+    return summarize.process_events(events,
+                                    masking_tiers = args.mask,
+                                    limiting_tier = args.limiting_tier,
+                                    limiting_annotation_regex = args.limiting_tier_pattern,
+                                    negate_limiting_annotation_regex = args.negate_pattern,
+                                    chunks = args.chunks,
+                                    chunk_processes = args.chunk_processes,
+                                    warn_overlaps = not preclipped)
+
+def sweep_chunked(segments, args):
+    events = summarize.get_events(segments)
+    return summarize.process_events(events,
+                                    masking_tiers = args.mask,
+                                    limiting_tier = args.limiting_tier,
+                                    limiting_annotation_regex = args.limiting_tier_pattern,
+                                    negate_limiting_annotation_regex = args.negate_pattern,
+                                    chunks = args.chunks,
+                                    chunk_processes = args.chunk_processes)
+
+# The chunked engine runs its chunks in this process: worker processes run the
+# same code, but starting a pool for each case would swamp the timings
+chunked = {'pre_clip': False, 'chunks': 4, 'chunk_processes': 1, 'min_chunk_events': 1}
+
+ENGINES = [
+    ('serial', {'pre_clip': False}, sweep_serial),
+    ('pre-clip', {'pre_clip': True}, sweep_pre_clip),
+    ('chunked', chunked, sweep_chunked),
+    ('pre-clip+chunked', dict(chunked, pre_clip = True), sweep_pre_clip),
+]
+
+def sweep_reference(segments, args):
+    events = reference.get_events(segments)
+    return reference.process_events(events,
+                                    masking_tiers = args.mask,
+                                    limiting_tier = args.limiting_tier,
+                                    limiting_annotation_regex = args.limiting_tier_pattern,
+                                    negate_limiting_annotation_regex = args.negate_pattern)
+
+# ==============================================================================
+# Random test cases
+# ------------------------------------------------------------------------------
+speaker_tiers = ['CHI', 'FA1', 'FA2', 'MA1', 'UC1', 'EE1']
+xds_codes = ['C', 'T', 'A', 'B', 'X']
+limiting_codes = ['on', 'off', 'on-skip', '']
+
+def random_times(rng, count, span, grid, reversed_rate):
+    """
+    Generate `count` (start, end) pairs on a coarse grid, so that equal
+    timestamps, touching boundaries, zero-length and nested segments are all
+    common.
+    """
+    times = []
+    end = 0
+    for _ in range(count):
+        kind = rng.random()
+        if kind < 0.15:
+            # Touching the previous segment
+            start = end
+        elif kind < 0.25:
+            # Nested inside (or overlapping) the previous segment
+            start = max(0, end - rng.randint(0, 4) * grid)
+        else:
+            start = rng.randint(0, span) * grid
+        length = rng.choice([0, 0, 1, 1, 2, 3, 5, 8, 20]) * grid
+        end = start + length
+        if rng.random() < reversed_rate:
+            (start, end) = (end + grid, start)
+        times.append((start, end))
+    if rng.random() < 0.5:
+        times.sort()
+    return times
+
+def conversation_times(rng, tiers, count, grid):
+    """
+    Generate `count` (start, end) pairs spread over `tiers`, one after another
+    like the turns of a conversation: each starts a little before, at, or after
+    the end of the previous one. Returns a dictionary of lists, by tier.
+    """
+    times = dict((tier, []) for tier in tiers)
+    end = 0
+    for _ in range(count):
+        start = max(0, end + rng.choice([-2, -1, 0, 0, 1, 2, 3, 10, 50]) * grid)
+        end = start + rng.choice([0, 1, 1, 2, 3, 5]) * grid
+        times[rng.choice(tiers)].append((start, end))
+    return times
+
+def random_eaf(rng, size, reversed_rate, conversation=False):
+    """
+    Generate a `SegmentFile` with a random set of tiers and segments; with
+    `conversation`, the speakers' segments mostly follow one another
+    """
+    eaf = summarize.SegmentFile()
+    grid = rng.choice([1, 10, 100])
+    span = max(4, size * rng.randint(1, 6))
+    tiers = rng.sample(speaker_tiers, rng.randint(1, len(speaker_tiers)))
+    if conversation:
+        times = conversation_times(rng, tiers, rng.randint(0, size * len(tiers)), grid)
+        span = max([span] + [end // grid for tier in tiers for (_, end) in times[tier]])
+    for tier in tiers:
+        eaf.add_tier(tier)
+        sub_tier = 'vcm@' + tier if tier == 'CHI' else 'xds@' + tier
+        eaf.add_tier(sub_tier)
+        if not conversation:
+            times = {tier: random_times(rng, rng.randint(0, size), span,
+                                        grid, reversed_rate)}
+        for (start, end) in times[tier]:
+            eaf.add_annotation(tier, start, end, 'x')
+            code = rng.choice(xds_codes)
+            if rng.random() < 0.2:
+                # XDS annotation that doesn't line up with its parent
+                start += rng.randint(-2, 2) * grid
+            eaf.add_annotation(sub_tier, start, end, code)
+    # Tiers without sub-tiers: the limiting tier, an ignored tier, and a
+    # possible masking tier that isn't a base tier
+    for tier in ['code', 'context', 'noise']:
+        eaf.add_tier(tier)
+        count = rng.randint(0, max(1, size // 4))
+        for (start, end) in random_times(rng, count, span, grid, 0):
+            eaf.add_annotation(tier, start, end * rng.randint(1, 3),
+                               rng.choice(limiting_codes))
+    return eaf
+
+def random_args(rng, template, eaf):
+    """Generate a random set of command-line options for a test case"""
+    args = copy.copy(template)
+    tiers = [t for t in eaf.get_tier_names() if '@' not in t]
+    args.ignore = rng.sample(tiers, rng.randint(0, 2)) if rng.random() < 0.3 else []
+    args.mask = rng.sample(tiers, rng.randint(1, 2)) if rng.random() < 0.5 else []
+    if rng.random() < 0.6:
+        args.limiting_tier = 'code'
+        args.limiting_tier_pattern = rng.choice(['.*', '^on$', 'on', 'off', '^$'])
+        args.negate_pattern = rng.random() < 0.3
+    else:
+        args.limiting_tier = None
+        args.limiting_tier_pattern = '.*'
+        args.negate_pattern = False
+    args.xds = rng.random() < 0.8
+    args.overlap = rng.random() < 0.8
+    args.totals = rng.random() < 0.8
+    args.max_combinations = rng.choice([None, None, 0, 1, 2, 5])
+    args.overlap_orders = rng.random() < 0.3
+    return args
+
+def base_segments(module, eaf, args):
+    """Collect the segments of the base tiers, as `summarize_eaf` does"""
+    ignored_tiers = module.get_ignored_tiers(args)
+    tiers = set(t.split('@')[-1] for t in eaf.get_tier_names() if '@' in t)
+    if args.limiting_tier:
+        tiers.add(args.limiting_tier)
+    tiers = [t for t in sorted(tiers) if t not in ignored_tiers]
+    return module.get_segments(eaf, tiers)
+
+# ==============================================================================
+# Comparison
+# ------------------------------------------------------------------------------
+class WarningCollector(logging.Handler):
+    """Collects the messages of the warnings logged while it is attached"""
+    def __init__(self):
+        logging.Handler.__init__(self, logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+def run(func, *func_args):
+    """
+    Call `func`, returning either its result or the exception it raised, along
+    with the sorted list of warnings it logged
+    """
+    collector = WarningCollector()
+    logging.getLogger().addHandler(collector)
+    try:
+        return ('ok', func(*func_args), sorted(collector.messages))
+    except Exception as error:
+        return ('error', type(error).__name__, sorted(collector.messages))
+    finally:
+        logging.getLogger().removeHandler(collector)
+
+def warning_differences(expected, found):
+    """
+    Compare the warnings logged by the reference and an engine, returning the
+    ones that only one of them logged, or `None` if they're the same. After an
+    exception, what was logged depends on how far each one got, so only the
+    exceptions are compared (along with the results).
+    """
+    if expected[0] != 'ok' or found[0] != 'ok' or expected[2] == found[2]:
+        return None
+    def _missing(messages, others):
+        others = list(others)
+        missing = []
+        for message in messages:
+            if message in others:
+                others.remove(message)
+            else:
+                missing.append(message)
+        return missing
+    return (_missing(expected[2], found[2]), _missing(found[2], expected[2]))
+
+def reference_rows(eaf, args, ignored_tiers):
+    """
+    Run the reference for all of its rows, and return the rows and pairwise
+    overlap table that `summarize_eaf` should give for `args`
+    """
+    full_args = copy.copy(args)
+    full_args.overlap = True
+    full_args.totals = True
+    (rows, _) = reference.summarize_eaf(eaf, 'case', full_args, ignored_tiers)
+    return overlap_rows(rows, args)
+
+def overlap_rows(rows, args):
+    """
+    Given the reference's rows (with every tier combination and the totals),
+    return the rows for `args`, with `--max-combinations` and
+    `--overlap-orders`, and the pairwise overlap table. A row's `Exclusive`
+    value is the section sum for its label, which is all that the overlap
+    orders and the table are made of.
+    """
+    if not rows:
+        return [], []
+    def _value(cell):
+        return cell if cell != '' else 0
+    def _cells(values):
+        return ['' if value == 0 else value for value in values]
+    tier_rows = [row for row in rows if '+' not in row[1] and row[1] != 'Totals']
+    combination_rows = [row for row in rows if '+' in row[1]]
+
+    orders = [0] * len(summarize.OverlapStats.order_labels)
+    pairs = defaultdict(int)
+    for row in tier_rows + combination_rows:
+        tiers = row[1].split('+')
+        exclusive = _value(row[2])
+        orders[min(len(tiers), len(orders)) - 1] += exclusive
+        for (i, tier) in enumerate(tiers):
+            for other_tier in tiers[i:]:
+                pairs[(tier, other_tier)] += exclusive
+
+    expected = list(tier_rows)
+    if args.overlap:
+        kept = combination_rows
+        if (args.max_combinations is not None and
+            len(combination_rows) > args.max_combinations):
+            # The same (stable) choice as `heapq.nlargest`
+            kept = sorted(combination_rows, key = lambda row: _value(row[2]),
+                          reverse = True)[:args.max_combinations]
+        expected.extend(row for row in combination_rows if row in kept)
+        if len(kept) < len(combination_rows):
+            other = [sum(_value(row[column]) for row in combination_rows
+                         if row not in kept)
+                     for column in range(2, len(rows[0]))]
+            expected.append(['case', 'Other'] + _cells(other))
+    if args.overlap_orders:
+        for (label, value) in zip(summarize.OverlapStats.order_labels, orders):
+            expected.append(['case', label] + _cells([value] + [0] * (len(rows[0]) - 3)))
+    if args.totals:
+        expected.append(rows[-1])
+    matrix = [['case', tier, other_tier, value]
+              for ((tier, other_tier), value) in sorted(pairs.items()) if value != 0]
+    return expected, matrix
+
+def summarize_rows(eaf, file_id, args, ignored_tiers):
+    """Run `summarize_eaf`, returning its rows and pairwise overlap table"""
+    overlap = summarize.OverlapStats()
+    (rows, _) = summarize.summarize_eaf(eaf, file_id, args, ignored_tiers,
+                                        overlap = overlap)
+    return rows, overlap.matrix_rows(file_id)
+
+def summarize_file(path, args):
+    """
+    Read and summarize a test case file, one recording at a time (as
+    `process_file` does). Every recording holds the same segments, so the
+    result for the first one is returned if the others (with its file ID)
+    match it, and the list of all of them otherwise.
+    """
+    eaf = summarize.read_input_file(path)
+    results = []
+    for (file_id, recording) in summarize.get_recordings(eaf, summarize.get_file_id(path)):
+        (rows, matrix) = summarize_rows(recording, file_id, args,
+                                        summarize.get_ignored_tiers(args))
+        results.append(([['case'] + list(row[1:]) for row in rows],
+                        [['case'] + list(row[1:]) for row in matrix]))
+    if any(result != results[0] for result in results):
+        return results
+    return results[0]
+
+def canonical_sweep(result, strict):
+    (status, value) = result[:2]
+    if status != 'ok':
+        return (status, value)
+    (union_sum, section_sums) = value
+    if not strict:
+        # Sections of zero duration are an artifact of the order of events
+        # with equal timestamps, and carry no time
+        section_sums = dict((k, v) for (k, v) in section_sums.items() if v != 0)
+    return (status, (union_sum, dict(section_sums)))
+
+def canonical_rows(result, strict):
+    (status, value) = result[:2]
+    if status != 'ok':
+        return (status, value)
+    (rows, _) = value
+    rows = [list(row) for row in rows]
+    if not strict:
+        # Likewise, rows with no values at all are left out
+        rows = [row for row in rows if any(cell != '' for cell in row[2:])]
+    return (status, rows)
+
+def canonical_matrix(result):
+    (status, value) = result[:2]
+    if status != 'ok':
+        return (status, value)
+    return (status, value[1])
+
+def describe(args):
+    return ('limiting={} pattern={!r} negate={} mask={} ignore={} '
+            'xds={} overlap={} totals={} max_combinations={} orders={}').format(
+                args.limiting_tier, args.limiting_tier_pattern,
+                args.negate_pattern, args.mask, args.ignore,
+                args.xds, args.overlap, args.totals,
+                args.max_combinations, args.overlap_orders)
+
+def report_mismatch(case, engine, what, expected, found, args):
+    print('MISMATCH case {} engine {} ({}): {}'.format(
+        case, engine, what, describe(args)))
+    print('  reference: {}'.format(expected))
+    print('  engine:    {}'.format(found))
+
+# ==============================================================================
+# Input backends
+# ------------------------------------------------------------------------------
+# Each test case is also written as an RTTM file and as a TextGrid file, which
+# are read back by the backends for those formats and summarized. Tiers become
+# RTTM speakers or TextGrid tiers as they are (including `xds@` tiers), and the
+# reference is run on the segments that the file can hold, sorted as they are
+# read back.
+# ------------------------------------------------------------------------------
+def write_rttm(eaf, path, rng):
+    """
+    Write an RTTM file; sometimes the segments are also written (interleaved)
+    for a second recording, which must be summarized separately. Returns the
+    list of recording IDs.
+    """
+    recordings = ['case', 'copy'] if rng.random() < 0.3 else ['case']
+    with open(path, 'w') as rttm:
+        rttm.write(';; test case\n')
+        for tier in eaf.get_tier_names():
+            for (start, end, value) in eaf.get_annotation_data_for_tier(tier):
+                for recording in recordings:
+                    rttm.write('SPEAKER {} 1 {:.3f} {:.3f} {} <NA> {} <NA> <NA>\n'.format(
+                        recording, start / 1000.0, (end - start) / 1000.0,
+                        value or '<NA>', tier))
+    return recordings
+
+def write_textgrid(eaf, path, rng):
+    """
+    Write a TextGrid file, in a random choice of format and encoding. Returns
+    the list of recording IDs (just the file's).
+    """
+    def _string(value):
+        return '"{}"'.format(value.replace('"', '""'))
+    def _time(ms):
+        return '{:.3f}'.format(ms / 1000.0).rstrip('0').rstrip('.')
+    tiers = list(eaf.get_tier_names())
+    if rng.random() < 0.5:
+        lines = ['File type = "ooTextFile"', 'Object class = "TextGrid"', '',
+                 'xmin = 0 ', 'xmax = 1 ', 'tiers? <exists> ',
+                 'size = {} '.format(len(tiers)), 'item []: ']
+        for (number, tier) in enumerate(tiers, 1):
+            intervals = eaf.get_annotation_data_for_tier(tier)
+            lines.extend(['    item [{}]:'.format(number),
+                          '        class = "IntervalTier" ',
+                          '        name = {} '.format(_string(tier)),
+                          '        xmin = 0 ', '        xmax = 1 ',
+                          '        intervals: size = {} '.format(len(intervals))])
+            for (index, (start, end, value)) in enumerate(intervals, 1):
+                lines.extend(['        intervals [{}]:'.format(index),
+                              '            xmin = {} '.format(_time(start)),
+                              '            xmax = {} '.format(_time(end)),
+                              '            text = {} '.format(_string(value))])
+    else:
+        header = rng.choice([['File type = "ooTextFile"', 'Object class = "TextGrid"'],
+                             ['File type = "ooTextFile short"', '"TextGrid"']])
+        lines = header + ['', '0', '1', '<exists>', str(len(tiers))]
+        for tier in tiers:
+            intervals = eaf.get_annotation_data_for_tier(tier)
+            lines.extend(['"IntervalTier"', _string(tier), '0', '1', str(len(intervals))])
+            for (start, end, value) in intervals:
+                lines.extend([_time(start), _time(end), _string(value)])
+    encoding = rng.choice(['utf-8', 'utf-16'])
+    with open(path, 'wb') as textgrid:
+        textgrid.write(('\n'.join(lines) + '\n').encode(encoding))
+    return ['case']
+
+def with_all_tiers(copied):
+    """
+    Without any tiers with sub-tiers, all of a file's tiers are summarized,
+    which the reference is told with an empty sub-tier for each
+    """
+    tiers = list(copied.get_tier_names())
+    if not any('@' in tier for tier in tiers):
+        for tier in tiers:
+            copied.add_tier('all@' + tier)
+    return copied
+
+def without_empty_tiers(eaf):
+    """RTTM files only have segments, so tiers without any are lost"""
+    copied = summarize.SegmentFile()
+    for tier in eaf.get_tier_names():
+        for (start, end, value) in sorted(eaf.get_annotation_data_for_tier(tier)):
+            copied.add_annotation(tier, start, end, value)
+    return with_all_tiers(copied)
+
+def without_empty_annotations(eaf):
+    """TextGrid intervals with blank text are gaps, not annotations"""
+    copied = summarize.SegmentFile()
+    for tier in eaf.get_tier_names():
+        copied.add_tier(tier)
+        for (start, end, value) in sorted(eaf.get_annotation_data_for_tier(tier)):
+            if value.strip():
+                copied.add_annotation(tier, start, end, value)
+    return with_all_tiers(copied)
+
+# Each backend is a name, a file name extension, a function that writes a test
+# case to a file (returning the IDs of the recordings in it), and one that
+# returns the test case as that backend can hold it
+BACKENDS = [
+    ('rttm', '.rttm', write_rttm, without_empty_tiers),
+    ('textgrid', '.TextGrid', write_textgrid, without_empty_annotations),
+]
+
+# ==============================================================================
+# Turn counts
+# ------------------------------------------------------------------------------
+# `TurnStats` has no reference implementation, so its counts are checked
+# against `expected_turns`, which works from the segments directly instead of
+# the sorted events. Each group's segments are merged into spans of speech. A
+# span ending (while the other group isn't speaking) is a silence, and the next
+# span to start, of either group, decides what happens to it.
+# ------------------------------------------------------------------------------
+def random_turn_args(rng, args):
+    """Add a random set of `--turns` options to a test case's options"""
+    args = copy.copy(args)
+    args.turns = True
+    args.turn_window = rng.choice([0, 1, 10, 100, 1000, 10 ** 9])
+    args.child_tiers = rng.choice([['CHI'], ['CHI', 'UC1']])
+    args.adult_tiers = rng.choice([['FA*', 'MA*'], ['FA1'], ['MA1', 'EE1']])
+    args.cds_turns_only = rng.random() < 0.3
+    # Asking for chunks must not lose the turns (they're counted in one pass)
+    args.chunks = rng.choice([1, 3])
+    args.chunk_processes = 1
+    return args
+
+def get_cds_segments(eaf):
+    return [segment for segment in summarize.get_segments(
+                eaf, [t for t in eaf.get_tier_names() if 'xds@' in t])
+            if segment.value in ('C', 'T')]
+
+def sweep_turns(segments, args, cds_segments):
+    events = summarize.get_events(segments)
+    if args.cds_turns_only:
+        summarize.mark_cds_events(events, cds_segments)
+    turns = summarize.TurnStats(args.child_tiers, args.adult_tiers, args.turn_window,
+                                cds_only = args.cds_turns_only,
+                                masking_tiers = args.mask,
+                                limiting_tier = args.limiting_tier)
+    summarize.process_events(events,
+                             masking_tiers = args.mask,
+                             limiting_tier = args.limiting_tier,
+                             limiting_annotation_regex = args.limiting_tier_pattern,
+                             negate_limiting_annotation_regex = args.negate_pattern,
+                             turns = turns,
+                             chunks = args.chunks,
+                             chunk_processes = args.chunk_processes)
+    return dict(turns.data)
+
+def expected_turns(segments, args, cds_segments):
+    matches = re.compile(args.limiting_tier_pattern).search
+    def _group(segment):
+        for (group, patterns) in (('child', args.child_tiers),
+                                  ('adult', args.adult_tiers)):
+            if any(fnmatch.fnmatchcase(segment.tier, p) for p in patterns):
+                if group == 'adult' and args.cds_turns_only:
+                    base = [c for c in cds_segments
+                            if c.tier.split('@')[-1] == segment.tier]
+                    if not any(c.start_time < segment.end_time and
+                               c.end_time > segment.start_time for c in base):
+                        return None
+                return group
+        return None
+
+    # Merge each group's segments into spans, and note the tiers starting
+    # segments at each time
+    spans = {'child': [], 'adult': []}
+    starting = defaultdict(lambda: defaultdict(list))
+    for segment in segments:
+        group = _group(segment)
+        if group is None:
+            continue
+        starting[segment.start_time][group].append(segment.tier)
+        if segment.start_time < segment.end_time:
+            spans[group].append((segment.start_time, segment.end_time))
+    for group in spans:
+        spans[group] = summarize.merge_intervals(spans[group])
+
+    def _counted(tier, time):
+        """Whether the time just after `time` is counted, for a turn to `tier`"""
+        def _active(test):
+            return any(s.start_time <= time < s.end_time
+                       for s in segments if test(s))
+        if args.limiting_tier and not _active(
+                lambda s: (s.tier == args.limiting_tier and
+                           bool(matches(s.value)) != args.negate_pattern)):
+            return False
+        return not _active(lambda s: s.tier in args.mask and s.tier != tier)
+
+    span_starts = sorted(set(start for group in spans
+                             for (start, _) in spans[group]))
+    turns = defaultdict(int)
+    for (group, other) in (('child', 'adult'), ('adult', 'child')):
+        for (_, silence) in spans[group]:
+            if any(start < silence <= end for (start, end) in spans[other]):
+                continue
+            later = [t for t in span_starts if t >= silence]
+            if not later:
+                continue
+            time = later[0]
+            answering = [g for g in spans if any(s == time for (s, _) in spans[g])]
+            if answering != [other] or time - silence > args.turn_window:
+                continue
+            tier = min(starting[time][other])
+            if _counted(tier, time):
+                entry = 'child_adult' if group == 'child' else 'adult_child'
+                turns[(tier, entry)] += 1
+                turns[(tier, entry + '_latency')] += time - silence
+    return dict(turns)
+
+# ==============================================================================
+# Command-line parser
+# ------------------------------------------------------------------------------
+parser = argparse.ArgumentParser(
+    description = "Compare the summarize-eaf.py engines against the frozen reference implementation.",
+)
+
+parser.add_argument('-n', '--cases',
+                    metavar = '<n>',
+                    type    = int,
+                    default = 500,
+                    help    = "Number of random test cases to run (default: %(default)s)")
+
+parser.add_argument('-s', '--seed',
+                    metavar = '<n>',
+                    type    = int,
+                    default = 0,
+                    help    = "Random seed; case <k> uses seed <n> + <k> (default: %(default)s)")
+
+parser.add_argument('--size',
+                    metavar = '<n>',
+                    type    = int,
+                    default = 20,
+                    help    = "Maximum number of segments per tier (default: %(default)s)")
+
+parser.add_argument('--reversed-rate',
+                    metavar = '<p>',
+                    type    = float,
+                    default = 0.01,
+                    help    = "Fraction of segments with start time > end time (default: %(default)s)")
+
+parser.add_argument('--engines',
+                    metavar = '<engine>',
+                    nargs   = '+',
+                    choices = ([name for (name, _, _) in ENGINES] +
+                               [name for (name, _, _, _) in BACKENDS] + ['turns']),
+                    help    = "Only test the named engines")
+
+parser.add_argument('--strict',
+                    action  = 'store_true',
+                    help    = "Also compare zero-duration sections and rows with no values")
+
+parser.add_argument('--max-failures',
+                    metavar = '<n>',
+                    type    = int,
+                    default = 10,
+                    help    = "Stop reporting mismatches after <n> (default: %(default)s)")
+
+# ==============================================================================
+# Main program
+# ------------------------------------------------------------------------------
+def main():
+    options = parser.parse_args()
+
+    # The random cases produce plenty of (expected) warnings, which are
+    # collected by `run` for comparison rather than shown
+    logging.basicConfig(level = logging.WARNING)
+    for handler in logging.getLogger().handlers:
+        handler.setLevel(logging.CRITICAL)
+
+    engines = [e for e in ENGINES
+               if options.engines is None or e[0] in options.engines]
+
+    # Start from the script's own defaults, so that options added later are
+    # present with their default values
+    template = summarize.parser.parse_args(['-o', os.devnull, 'case.eaf'])
+    template.output.close()
+
+    timings = defaultdict(float)
+    failures = defaultdict(int)
+    total_failures = 0
+
+    # The test cases are written here for the input backends
+    directory = tempfile.mkdtemp(prefix = 'check-engines-')
+    try:
+        for case in range(options.cases):
+            rng = random.Random(options.seed + case)
+            eaf = random_eaf(rng, options.size, options.reversed_rate)
+            args = random_args(rng, template, eaf)
+            ignored_tiers = reference.get_ignored_tiers(args)
+
+            # Reference results
+            segments = base_segments(reference, eaf, args)
+            start = timer()
+            expected_sweep = run(sweep_reference, segments, args) if segments else None
+            timings[('reference', 'sweep')] += timer() - start
+            start = timer()
+            expected_rows = run(reference_rows, eaf, args, ignored_tiers)
+            timings[('reference', 'rows')] += timer() - start
+
+            for (name, overrides, sweep) in engines:
+                engine_args = copy.copy(args)
+                for (key, value) in overrides.items():
+                    setattr(engine_args, key, value)
+
+                mismatches = []
+                if expected_sweep is not None:
+                    segments = base_segments(summarize, eaf, engine_args)
+                    start = timer()
+                    found_sweep = run(sweep, segments, engine_args)
+                    timings[(name, 'sweep')] += timer() - start
+                    expected = canonical_sweep(expected_sweep, options.strict)
+                    found = canonical_sweep(found_sweep, options.strict)
+                    if expected != found:
+                        mismatches.append(('union_sum/section_sums', expected, found))
+                    differences = warning_differences(expected_sweep, found_sweep)
+                    if differences:
+                        mismatches.append(('sweep warnings',) + differences)
+
+                start = timer()
+                found_rows = run(summarize_rows, eaf, 'case', engine_args,
+                                 summarize.get_ignored_tiers(engine_args))
+                timings[(name, 'rows')] += timer() - start
+                expected = canonical_rows(expected_rows, options.strict)
+                found = canonical_rows(found_rows, options.strict)
+                if expected != found:
+                    mismatches.append(('rows', expected, found))
+                expected = canonical_matrix(expected_rows)
+                found = canonical_matrix(found_rows)
+                if expected != found:
+                    mismatches.append(('overlap matrix', expected, found))
+                differences = warning_differences(expected_rows, found_rows)
+                if differences:
+                    mismatches.append(('warnings',) + differences)
+
+                if mismatches:
+                    failures[name] += 1
+                    total_failures += 1
+                    if total_failures <= options.max_failures:
+                        for (what, expected, found) in mismatches:
+                            report_mismatch(options.seed + case, name, what,
+                                            expected, found, args)
+
+            # Input backends, which are compared with the reference run on the
+            # test case as each one can hold it, without `--strict`
+            for (name, extension, write, held) in BACKENDS:
+                if options.engines is not None and name not in options.engines:
+                    continue
+                path = os.path.join(directory, 'case' + extension)
+                recordings = write(eaf, path, rng)
+                expected = run(reference_rows, held(eaf), args, ignored_tiers)
+                # Each recording's warnings are logged, with its own file ID
+                expected = expected[:2] + (sorted(
+                    re.sub(' file case$', ' file ' + recording, message)
+                    for recording in recordings for message in expected[2]),)
+                start = timer()
+                found = run(summarize_file, path, args)
+                timings[(name, 'rows')] += timer() - start
+                mismatches = []
+                differences = warning_differences(expected, found)
+                if differences:
+                    mismatches.append(('warnings',) + differences)
+                if canonical_matrix(expected) != canonical_matrix(found):
+                    mismatches.insert(0, ('overlap matrix', canonical_matrix(expected),
+                                          canonical_matrix(found)))
+                expected = canonical_rows(expected, False)
+                found = canonical_rows(found, False)
+                if expected != found:
+                    mismatches.insert(0, ('rows', expected, found))
+                if mismatches:
+                    failures[name] += 1
+                    total_failures += 1
+                    if total_failures <= options.max_failures:
+                        for (what, expected, found) in mismatches:
+                            report_mismatch(options.seed + case, name, what,
+                                            expected, found, args)
+
+            # Turn counts, for a conversation-like case, from the segments in their
+            # original and a shuffled order
+            if options.engines is None or 'turns' in options.engines:
+                eaf = random_eaf(rng, options.size, options.reversed_rate,
+                                 conversation = True)
+                turn_args = random_turn_args(rng, random_args(rng, template, eaf))
+                segments = base_segments(summarize, eaf, turn_args)
+                if all(s.start_time <= s.end_time for s in segments):
+                    cds_segments = get_cds_segments(eaf)
+                    expected = expected_turns(segments, turn_args, cds_segments)
+                    shuffled = list(segments)
+                    rng.shuffle(shuffled)
+                    for order in (segments, shuffled):
+                        start = timer()
+                        found = run(sweep_turns, order, turn_args, cds_segments)
+                        timings[('turns', 'sweep')] += timer() - start
+                        if found[0] == 'ok' and found[1] != expected:
+                            failures['turns'] += 1
+                            total_failures += 1
+                            if total_failures <= options.max_failures:
+                                report_mismatch(options.seed + case, 'turns', 'turns',
+                                                expected, found[1], turn_args)
+                            break
+    finally:
+        shutil.rmtree(directory)
+
+    # Summary table
+    print('{:<16} {:>9} {:>10} {:>8} {:>10} {:>8}'.format(
+        'Engine', 'Failures', 'Sweep (s)', 'Speed', 'Rows (s)', 'Speed'))
+    print('{:<16} {:>9} {:>10.3f} {:>8} {:>10.3f} {:>8}'.format(
+        'reference', '-',
+        timings[('reference', 'sweep')], '1.00x',
+        timings[('reference', 'rows')], '1.00x'))
+    for (name, _, _) in engines:
+        def _speed(what):
+            if timings[(name, what)] == 0:
+                return '-'
+            return '{:.2f}x'.format(timings[('reference', what)] / timings[(name, what)])
+        print('{:<16} {:>9} {:>10.3f} {:>8} {:>10.3f} {:>8}'.format(
+            name, failures[name],
+            timings[(name, 'sweep')], _speed('sweep'),
+            timings[(name, 'rows')], _speed('rows')))
+    for (name, _, _, _) in BACKENDS:
+        if options.engines is None or name in options.engines:
+            print('{:<16} {:>9} {:>10} {:>8} {:>10.3f} {:>8}'.format(
+                name, failures[name], '-', '-', timings[(name, 'rows')],
+                '{:.2f}x'.format(timings[('reference', 'rows')] / timings[(name, 'rows')])
+                if timings[(name, 'rows')] else '-'))
+    if options.engines is None or 'turns' in options.engines:
+        print('{:<16} {:>9} {:>10.3f} {:>8} {:>10} {:>8}'.format(
+            'turns', failures['turns'], timings[('turns', 'sweep')], '-', '-', '-'))
+
+    return 1 if total_failures else 0
+
+# ------------------------------------------------------------------------------
+if __name__ == '__main__':
+    sys.exit(main())
@@ -29,14 +29,21 @@
 from __future__ import print_function
 
 import argparse
+import bisect
+import codecs
 import csv
+import fnmatch
+import heapq
+import json
 import logging
+import multiprocessing
 import os
 import re
 import sys
 import warnings
 
-from collections import defaultdict
+from collections import defaultdict, deque
+from timeit import default_timer as timer
 
 import pympi  # Import for EAF file parsing
 
@@ -46,6 +53,9 @@ __author__  = 'Michael Richters'
 __email__   = 'gedankenexperimenter@gmail.com'
 __license__ = 'UNLICENSE'
 
+# Log level for per-event output (used with `-vvv`)
+logging.VERBOSE = 5
+
 # ==============================================================================
 # Class definitions
 # ------------------------------------------------------------------------------
@@ -74,11 +84,140 @@ class Segment:
         self.end_time   = int(end_time)
         self.value      = value
 
+# ------------------------------------------------------------------------------
+class SegmentFile:
+    """
+    Base class for the input backends for file formats other than EAF. The
+    segments of each tier are read into a list of `(start_time, end_time,
+    value)` tuples (with times in ms), sorted by time, and provided through the
+    same methods as a `pympi.Elan.Eaf` object, so that the segments of any
+    format are filtered and summarized the same way. Subclasses implement
+    `read()`, calling `add_tier()` and `add_annotation()`; without a file name,
+    an empty object is created, which can be filled in directly. A tier that
+    isn't in the file has no segments (like a speaker with no RTTM lines).
+    """
+    def __init__(self, file_name=None):
+        self.tiers = dict()
+        if file_name is not None:
+            self.read(file_name)
+            for segments in self.tiers.values():
+                segments.sort()
+
+    def add_tier(self, tier):
+        self.tiers.setdefault(tier, [])
+
+    def add_annotation(self, tier, start_time, end_time, value):
+        self.tiers.setdefault(tier, []).append((start_time, end_time, value))
+
+    def get_tier_names(self):
+        return self.tiers.keys()
+
+    def get_annotation_data_for_tier(self, tier):
+        return self.tiers.get(tier, [])
+
+# ------------------------------------------------------------------------------
+class RttmFile(SegmentFile):
+    """
+    Reads the `SPEAKER` lines of an RTTM file (as written by diarization
+    systems), with one tier for each speaker name. The orthography field, if
+    it isn't `<NA>`, is used as the annotation value. The segments of each
+    recording (the file ID field) are kept apart in `recordings`, a list of
+    `(recording_id, SegmentFile)` pairs in order of appearance; only if there
+    is a single recording are its tiers also those of the `RttmFile` itself.
+    """
+    def read(self, file_name):
+        self.recordings = []
+        recordings = dict()
+        with open(file_name) as rttm:
+            for (number, line) in enumerate(rttm, 1):
+                fields = line.split()
+                if not fields or fields[0] != 'SPEAKER':
+                    continue
+                if len(fields) < 8:
+                    raise ValueError('Malformed RTTM line {} in {}'.format(
+                        number, file_name))
+                if fields[1] not in recordings:
+                    recordings[fields[1]] = SegmentFile()
+                    self.recordings.append((fields[1], recordings[fields[1]]))
+                onset = float(fields[3])
+                offset = onset + float(fields[4])
+                value = '' if fields[5] == '<NA>' else fields[5]
+                recordings[fields[1]].add_annotation(
+                    fields[7], int(round(onset * 1000)), int(round(offset * 1000)), value)
+        for (_, recording) in self.recordings:
+            for segments in recording.tiers.values():
+                segments.sort()
+        if len(self.recordings) == 1:
+            self.tiers = self.recordings[0][1].tiers
+
+# ------------------------------------------------------------------------------
+class TextGridFile(SegmentFile):
+    """
+    Reads the interval tiers of a Praat TextGrid file, in either the long or
+    the short text format, with a segment for each interval with a non-empty
+    label. Point tiers are skipped.
+    """
+    # Both formats hold the same sequence of values: numbers, strings (with
+    # doubled quotes inside), and flags like `<exists>`. The names of the
+    # values in the long format, and item numbers in brackets, are skipped.
+    token_pattern = re.compile(r'"((?:[^"]|"")*)"|'
+                               r'(?<![\w\[.])(-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)(?![\w\].])|'
+                               r'(<\w+>)')
+
+    def tokens(self, text):
+        for match in self.token_pattern.finditer(text):
+            (string, number, flag) = match.groups()
+            if string is not None:
+                yield string.replace('""', '"')
+            else:
+                yield number or flag
+
+    def read(self, file_name):
+        with open(file_name, 'rb') as textgrid:
+            data = textgrid.read()
+        if data.startswith((codecs.BOM_UTF16_BE, codecs.BOM_UTF16_LE)):
+            text = data.decode('utf-16')
+        else:
+            text = data.decode('utf-8-sig')
+        tokens = self.tokens(text)
+        try:
+            # Older versions of Praat write "ooTextFile short" for the short
+            # format, which is otherwise the same
+            if (next(tokens) not in ('ooTextFile', 'ooTextFile short') or
+                next(tokens) != 'TextGrid'):
+                raise ValueError('{} is not a text TextGrid file'.format(file_name))
+            # The time range of the whole file
+            next(tokens), next(tokens)
+            if next(tokens) != '<exists>':
+                return
+            for _ in range(int(next(tokens))):
+                (tier_class, tier) = (next(tokens), next(tokens))
+                next(tokens), next(tokens)
+                count = int(next(tokens))
+                if tier_class != 'IntervalTier':
+                    logging.debug('Skipping point tier %s in %s', tier, file_name)
+                    for _ in range(count):
+                        next(tokens), next(tokens)
+                    continue
+                self.add_tier(tier)
+                for _ in range(count):
+                    (start, end, value) = (next(tokens), next(tokens), next(tokens))
+                    if value.strip():
+                        self.add_annotation(tier, int(round(float(start) * 1000)),
+                                            int(round(float(end) * 1000)), value)
+        except StopIteration:
+            raise ValueError('Unexpected end of TextGrid file {}'.format(file_name))
+
 # ------------------------------------------------------------------------------
 class OutputRecord:
     """Represents a row of the data table to be written to the output file"""
     data_labels = ['exclusive', 'total', 'cds', 'ads', 'both']
     header = ['File', 'Tier(s)', 'Exclusive', 'Total', 'CDS', 'ADS', 'BOTH']
+    # Extra columns, added with `--turns`
+    turn_data_labels = ['child_adult', 'child_adult_latency',
+                        'adult_child', 'adult_child_latency']
+    turn_header = ['CHI-Adult Turns', 'CHI-Adult Latency',
+                   'Adult-CHI Turns', 'Adult-CHI Latency']
 
     def __init__(self, file_id, label):
         self.file_id = file_id
@@ -86,22 +225,393 @@ class OutputRecord:
         self.data = defaultdict(int)
         return
 
-    def fmt(self):
+    @classmethod
+    def columns(cls, args):
+        """Return the data labels and header of the output table for `args`"""
+        if args.turns:
+            return (cls.data_labels + cls.turn_data_labels,
+                    cls.header + cls.turn_header)
+        return (cls.data_labels, cls.header)
+
+    def fmt(self, data_labels=None):
+        if data_labels is None:
+            data_labels = self.data_labels
         values = [self.file_id, self.label]
         def _blank_zero(entry):
             value = self.data[entry]
             return '' if value == 0 else value
-        data_values = map(_blank_zero, self.data_labels)
+        data_values = map(_blank_zero, data_labels)
         values.extend(data_values)
         return values
 
+# ------------------------------------------------------------------------------
+class OverlapStats:
+    """
+    Accumulates overlap totals during a sweep: the time each pair of tiers was
+    active together (the diagonal holds each tier's own total), and the time
+    during which one, two, or three or more tiers were active. Each section
+    costs O(n²) for n active tiers, however many combinations there are.
+    """
+    order_labels = ['1 tier', '2 tiers', '3+ tiers']
+
+    def __init__(self):
+        self.pairs = defaultdict(int)
+        self.orders = defaultdict(int)
+
+    def add(self, tiers, duration):
+        """Add a section of `duration` ms, given the sorted list of its tiers"""
+        self.orders[min(len(tiers), len(self.order_labels))] += duration
+        for (i, tier) in enumerate(tiers):
+            for other_tier in tiers[i:]:
+                self.pairs[(tier, other_tier)] += duration
+
+    def merge(self, other):
+        for (key, value) in other.pairs.items():
+            self.pairs[key] += value
+        for (key, value) in other.orders.items():
+            self.orders[key] += value
+
+    def order_records(self, file_id):
+        """Return an `OutputRecord` for each overlap order"""
+        records = []
+        for (order, label) in enumerate(self.order_labels, 1):
+            record = OutputRecord(file_id, label)
+            record.data['exclusive'] = self.orders[order]
+            records.append(record)
+        return records
+
+    def matrix_rows(self, file_id):
+        """Return the rows of the pairwise overlap table"""
+        return [[file_id, tier, other_tier, value]
+                for ((tier, other_tier), value) in sorted(self.pairs.items())
+                if value != 0]
+
+# ------------------------------------------------------------------------------
+class TurnStats:
+    """
+    Counts conversational turns between the child tiers and the adult tiers
+    during the sweep of `process_events`. When all the tiers of one group have
+    fallen silent (while the other group wasn't speaking), the other group
+    starting no more than `window` ms later is counted as a turn (each silence
+    answers at most one turn), and the time between them is added to the
+    response latency. The counts and latencies are kept for the responding
+    tier (the first by name, if several start at once).
+
+    The events at each timestamp are handled together, once the sweep has
+    moved past them, so that the results don't depend on their order: a
+    group starts or falls silent only if its number of active segments goes
+    up from, or down to, zero, and a turn is only counted if the time after
+    it is counted (the limiting tier is active, and masking tiers other than
+    the responding tier aren't). If `cds_only` is set, adult events that
+    haven't been marked as CDS (see `mark_cds_events`) are left out.
+    """
+    def __init__(self, child_tiers, adult_tiers, window, cds_only=False,
+                 masking_tiers=(), limiting_tier=None):
+        self.child_tiers = child_tiers
+        self.adult_tiers = adult_tiers
+        self.window = window
+        self.cds_only = cds_only
+        self.masking_tiers = masking_tiers
+        self.limiting_tier = limiting_tier
+        self.groups = dict()
+        # Number of active segments of each group, and the time each group
+        # fell silent (if it hasn't spoken or been answered since)
+        self.active = {'child': 0, 'adult': 0}
+        self.silent = {'child': None, 'adult': None}
+        # The events of the current timestamp
+        self.timestamp = None
+        self.batch = []
+        self.data = defaultdict(int)
+
+    def group(self, tier):
+        """Return the group (`child` or `adult`) of a tier, or `None`"""
+        if tier not in self.groups:
+            self.groups[tier] = None
+            for (group, patterns) in (('child', self.child_tiers),
+                                      ('adult', self.adult_tiers)):
+                if any(fnmatch.fnmatchcase(tier, p) for p in patterns):
+                    self.groups[tier] = group
+                    break
+        return self.groups[tier]
+
+    def add(self, event, section_tiers):
+        """
+        Add an event from the sweep, along with the list of active tiers
+        before it, which (for the first event at a new timestamp) tells whether
+        the time after the previous timestamp is counted
+        """
+        if event.timestamp != self.timestamp:
+            self.flush(section_tiers)
+            self.timestamp = event.timestamp
+        group = self.group(event.label)
+        if group is None:
+            return
+        if group == 'adult' and self.cds_only and not getattr(event, 'cds', False):
+            return
+        self.batch.append((group, event))
+
+    def flush(self, section_tiers):
+        """Handle the events of the current timestamp"""
+        if not self.batch:
+            return
+        change = {'child': 0, 'adult': 0}
+        starting = {'child': [], 'adult': []}
+        for (group, event) in self.batch:
+            change[group] += event.change
+            if event.change > 0:
+                starting[group].append(event.label)
+        self.batch = []
+
+        before = dict(self.active)
+        started = []
+        for group in ('child', 'adult'):
+            other = 'adult' if group == 'child' else 'child'
+            self.active[group] += change[group]
+            if before[group] > 0 and self.active[group] <= 0 and before[other] <= 0:
+                self.silent[group] = self.timestamp
+            elif before[group] <= 0 and self.active[group] > 0:
+                started.append(group)
+
+        # If both groups start at once, neither one answers the other
+        if len(started) == 1:
+            group = started[0]
+            other = 'adult' if group == 'child' else 'child'
+            silent = self.silent[other]
+            if silent is not None and self.timestamp - silent <= self.window:
+                tier = min(starting[group])
+                if self.counted(tier, section_tiers):
+                    self.count(other, tier, self.timestamp - silent)
+        # A group that starts ends its own silence, and answers (or lets pass)
+        # the other group's
+        if started:
+            self.silent = {'child': None, 'adult': None}
+
+    def counted(self, tier, section_tiers):
+        """Return whether a turn to `tier` is in counted time"""
+        if self.limiting_tier and self.limiting_tier not in section_tiers:
+            return False
+        for masking_tier in self.masking_tiers:
+            if masking_tier != tier and masking_tier in section_tiers:
+                return False
+        return True
+
+    def count(self, group, tier, latency):
+        """Add a turn from `group` to the responding `tier`"""
+        entry = 'child_adult' if group == 'child' else 'adult_child'
+        self.data[(tier, entry)] += 1
+        self.data[(tier, entry + '_latency')] += latency
+
+    def add_to_records(self, output_records, file_id):
+        """Add the turn counts and latencies to the output records"""
+        for ((tier, entry), value) in self.data.items():
+            if tier not in output_records:
+                output_records[tier] = OutputRecord(file_id, tier)
+            output_records[tier].data[entry] += value
+            output_records['totals'].data[entry] += value
+
+# ------------------------------------------------------------------------------
+class GroupAccumulator:
+    """
+    Accumulates the output records of a group of EAF files, keeping the sum of
+    each value for each tier (or combination of tiers), along with the number
+    of files, so that means can be computed. Accumulators can be merged.
+    """
+    @staticmethod
+    def get_header(header = OutputRecord.header):
+        """Return the group table header for the given output table header"""
+        return (['Grouping', 'Group', 'Files', 'Tier(s)'] + header[2:] +
+                [name + ' (mean)' for name in header[2:]])
+
+    def __init__(self, grouping='', group='', data_labels=OutputRecord.data_labels):
+        self.grouping = grouping
+        self.group = group
+        self.data_labels = data_labels
+        self.files = 0
+        self.records = dict()
+
+    def record(self, label):
+        if label not in self.records:
+            self.records[label] = OutputRecord(self.group, label)
+        return self.records[label]
+
+    def add_records(self, records):
+        """
+        Add the output records of a single file (as returned by
+        `summarize_eaf`), whether or not they were written to the output table
+        """
+        self.files += 1
+        for other_record in records.values():
+            record = self.record(other_record.label)
+            for (entry, value) in other_record.data.items():
+                record.data[entry] += value
+
+    def merge(self, other):
+        """Add the contents of another accumulator to this one"""
+        self.files += other.files
+        for (label, other_record) in other.records.items():
+            record = self.record(label)
+            for (entry, value) in other_record.data.items():
+                record.data[entry] += value
+
+    def labels(self):
+        """Return the labels in output order: tiers, combinations, then totals"""
+        def _order(label):
+            if label == 'Totals':
+                return (2, label)
+            return (1 if '+' in label else 0, label)
+        return sorted(self.records.keys(), key = _order)
+
+    def fmt(self):
+        """Return the rows of the group-level output table for this group"""
+        rows = []
+        for label in self.labels():
+            record = self.records[label]
+            values = [self.grouping, self.group, self.files]
+            values.extend(record.fmt(self.data_labels)[1:])
+            for entry in self.data_labels:
+                value = record.data[entry]
+                values.append('' if value == 0 else
+                              '{:.1f}'.format(float(value) / self.files))
+            rows.append(values)
+        return rows
+
+# ------------------------------------------------------------------------------
+class ProgressReporter:
+    """
+    Reports progress through a batch of EAF files on STDERR, either as a
+    single status line that is redrawn in place (for a terminal), or as one
+    JSON object per report (for log files). Reports are written at most once
+    per `interval` seconds, so calling `update()` for every file is cheap.
+    """
+    slowest_count = 5
+    window_size = 20
+
+    def __init__(self, file_sizes, mode='tty', interval=None, stream=None):
+        self.mode = mode
+        self.stream = stream if stream is not None else sys.stderr
+        if interval is None:
+            interval = 0.25 if mode == 'tty' else 30.0
+        self.interval = interval
+        self.files_total = len(file_sizes)
+        self.bytes_total = sum(file_sizes)
+        self.files_done = 0
+        self.bytes_done = 0
+        self.counts = defaultdict(int)
+        self.slowest = []
+        self.start_time = timer()
+        self.last_report = self.start_time
+        self.last_length = 0
+        # Recent (time, bytes done) samples, for a moving-average rate
+        self.window = deque([(self.start_time, 0)], maxlen=self.window_size)
+
+    def update(self, file_id, file_bytes, stats, elapsed):
+        """Record the completion of one file, with its segment counts"""
+        self.files_done += 1
+        self.bytes_done += file_bytes
+        for (key, value) in stats.items():
+            self.counts[key] += value
+        entry = (elapsed, file_id)
+        if len(self.slowest) < self.slowest_count:
+            heapq.heappush(self.slowest, entry)
+        elif entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+        now = timer()
+        self.window.append((now, self.bytes_done))
+        if now - self.last_report >= self.interval:
+            self.last_report = now
+            self.report(now)
+
+    def status(self, now):
+        """Return a dictionary describing the current state of the batch"""
+        elapsed = now - self.start_time
+        (window_start, window_bytes) = self.window[0]
+        rate = 0.0
+        if now > window_start:
+            rate = (self.bytes_done - window_bytes) / (now - window_start)
+        eta = None
+        if rate > 0:
+            eta = (self.bytes_total - self.bytes_done) / rate
+        segments = self.counts['segments']
+        status = {
+            'files_done'    : self.files_done,
+            'files_total'   : self.files_total,
+            'bytes_done'    : self.bytes_done,
+            'bytes_total'   : self.bytes_total,
+            'segments'      : segments,
+            'segments_per_s': round(segments / elapsed, 1) if elapsed > 0 else 0.0,
+            'elapsed_s'     : round(elapsed, 1),
+            'eta_s'         : round(eta, 1) if eta is not None else None,
+            'slowest'       : [[file_id, round(seconds, 3)]
+                               for (seconds, file_id) in sorted(self.slowest, reverse=True)],
+        }
+        # Other counts (e.g. of bridged gaps) are only reported if present
+        for (key, value) in self.counts.items():
+            if key not in status:
+                status[key] = value
+        return status
+
+    def report(self, now=None, final=False):
+        status = self.status(timer() if now is None else now)
+        if self.mode == 'json':
+            status['done'] = final
+            self.stream.write(json.dumps(status, sort_keys=True) + '\n')
+        else:
+            line = self.fmt(status)
+            padding = ' ' * max(0, self.last_length - len(line))
+            self.last_length = len(line)
+            self.stream.write('\r' + line + padding + ('\n' if final else ''))
+        self.stream.flush()
+
+    def finish(self):
+        self.report(final=True)
+
+    @staticmethod
+    def fmt(status):
+        def _duration(seconds):
+            if seconds is None:
+                return '--:--'
+            (minutes, seconds) = divmod(int(seconds), 60)
+            (hours, minutes) = divmod(minutes, 60)
+            if hours:
+                return '{:d}:{:02d}:{:02d}'.format(hours, minutes, seconds)
+            return '{:d}:{:02d}'.format(minutes, seconds)
+        line = '[{}/{}] {:.1f}/{:.1f} MB, {:,.0f} segments/s, elapsed {}, ETA {}'.format(
+            status['files_done'], status['files_total'],
+            status['bytes_done'] / 1e6, status['bytes_total'] / 1e6,
+            status['segments_per_s'],
+            _duration(status['elapsed_s']), _duration(status['eta_s']),
+        )
+        if 'bridged' in status:
+            line += ', {:,} bridged, {:,} overlapping, {:,} dropped'.format(
+                status['bridged'], status['overlapping'], status['dropped'])
+        if status['slowest']:
+            (file_id, seconds) = status['slowest'][0]
+            line += ', slowest: {} ({:.1f}s)'.format(file_id, seconds)
+        return line
+
+# ------------------------------------------------------------------------------
+class ProgressLineFilter(logging.Filter):
+    """
+    Erases the status line of a `tty` progress report before each log message
+    is written, so that messages aren't printed on top of it. The line is
+    redrawn with the next report.
+    """
+    def __init__(self, stream=None):
+        logging.Filter.__init__(self)
+        self.stream = stream if stream is not None else sys.stderr
+
+    def filter(self, record):
+        self.stream.write('\r\x1b[K')
+        self.stream.flush()
+        return True
+
 # ==============================================================================
 # Helper functions
 # ------------------------------------------------------------------------------
 def get_segments(eaf, tiers):
     """
     Extract a list of annotated segments for a set of tiers from an
-    EAF file object.
+    EAF file object (or a `SegmentFile` for other formats).
     """
     segments = []
     for tier in tiers:
@@ -110,6 +620,69 @@ def get_segments(eaf, tiers):
             segments.append(Segment(tier, start_time, end_time, value))
     return segments
 
+# ------------------------------------------------------------------------------
+def bridge_segments(segments, bridge_gaps=0, min_duration=0,
+                    value_tiers=(), stats=None):
+    """
+    Merge segments of the same tier that are separated by gaps shorter than
+    `bridge_gaps` ms, or that overlap, then drop any segments shorter than
+    `min_duration` ms. Without `bridge_gaps`, nothing is merged (so that
+    overlapping segments are still reported, and short ones are judged on
+    their own). For tiers in `value_tiers`, only consecutive segments with the
+    same annotation value are merged. Each tier's segments are sorted by start
+    time, and then bridged and filtered in a single pass. The numbers of
+    bridged gaps, merged overlapping segments, and dropped segments are added
+    to `stats`, if it is given.
+    """
+    if not (bridge_gaps or min_duration):
+        return segments
+
+    # Group the segments by tier, keeping the order of the tiers
+    tiers = []
+    groups = dict()
+    for segment in segments:
+        if segment.tier not in groups:
+            tiers.append(segment.tier)
+            groups[segment.tier] = []
+        groups[segment.tier].append((segment.start_time, segment.end_time, segment.value))
+
+    bridged = 0
+    overlapping = 0
+    dropped = 0
+    result = []
+    for tier in tiers:
+        match_values = tier in value_tiers
+        current = None
+        for (start_time, end_time, value) in sorted(groups[tier]):
+            if (bridge_gaps > 0 and current is not None and
+                start_time - current[1] < bridge_gaps and
+                not (match_values and value != current[2])):
+                if start_time < current[1]:
+                    overlapping += 1
+                else:
+                    bridged += 1
+                current[1] = max(current[1], end_time)
+                continue
+            if current is not None:
+                if current[1] - current[0] >= min_duration:
+                    result.append(Segment(tier, *current))
+                else:
+                    dropped += 1
+            current = [start_time, end_time, value]
+        if current is not None:
+            if current[1] - current[0] >= min_duration:
+                result.append(Segment(tier, *current))
+            else:
+                dropped += 1
+
+    logging.debug('Bridged {:,} gaps, merged {:,} overlapping segments, and '
+                  'dropped {:,} short segments'.format(bridged, overlapping, dropped))
+    if stats is not None:
+        stats['bridged'] += bridged
+        stats['overlapping'] += overlapping
+        stats['dropped'] += dropped
+    return result
+
 # ------------------------------------------------------------------------------
 def get_events(segments, label_func=lambda x: x.tier):
     """
@@ -133,12 +706,258 @@ def get_events(segments, label_func=lambda x: x.tier):
                             start      = False))
     return events
 
+# ------------------------------------------------------------------------------
+def mark_cds_events(events, cds_segments):
+    """
+    Given a list of events in the order returned by `get_events` (the start
+    and end of each segment in turn), set the `cds` attribute of both events
+    of each segment that overlaps one of the `cds_segments` of its tier (from
+    the XDS sub-tiers).
+    """
+    spans = defaultdict(list)
+    for segment in cds_segments:
+        spans[segment.tier.split('@')[-1]].append((segment.start_time, segment.end_time))
+    ends = dict()
+    for tier in spans:
+        spans[tier] = merge_intervals(spans[tier])
+        ends[tier] = [end for (_, end) in spans[tier]]
+    for (start, end) in zip(events[0::2], events[1::2]):
+        cds = False
+        if start.label in spans:
+            index = bisect.bisect_right(ends[start.label], start.timestamp)
+            cds = (index < len(spans[start.label]) and
+                   spans[start.label][index][0] < end.timestamp)
+        start.cds = end.cds = cds
+
+# ------------------------------------------------------------------------------
+limiting_filters = dict()
+
+def get_limiting_filter(regex, negate=False):
+    """
+    Return a function that decides whether a limiting tier annotation matches
+    `regex` (or doesn't, if `negate` is set). The pattern is compiled once, and
+    the result is remembered for each distinct annotation value.
+    """
+    key = (regex, negate)
+    if key not in limiting_filters:
+        pattern = re.compile(regex)
+        matches = dict()
+        def _filter(annotation):
+            if annotation not in matches:
+                matches[annotation] = bool(pattern.search(annotation)) != negate
+            return matches[annotation]
+        limiting_filters[key] = _filter
+    return limiting_filters[key]
+
+# ------------------------------------------------------------------------------
+def merge_intervals(intervals, touching=True):
+    """
+    Merge a list of `(start, end)` intervals into a sorted list of disjoint
+    ones. If `touching` is false, intervals that only share an endpoint are
+    kept separate.
+    """
+    merged = []
+    for (start, end) in sorted(intervals):
+        if merged and (start < merged[-1][1] or (touching and start == merged[-1][1])):
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return merged
+
+# ------------------------------------------------------------------------------
+def warn_overlapping_segments(labelled_segments, labels, limiting_tier = None,
+                              limiting_filter = None):
+    """
+    Given a list of `(label, Segment)` pairs (in the order `get_events` would
+    see them), log the warnings about overlapping segments that
+    `process_events` would give for the segments of `labels`, in the same
+    order. Limiting tier segments that don't pass `limiting_filter` are
+    skipped, as they are by `process_events`.
+    """
+    # The events are numbered in their order in the list, which is their
+    # order in the (stable) sort among events with the same timestamp
+    events = []
+    for (index, (label, segment)) in enumerate(labelled_segments):
+        if label not in labels:
+            continue
+        if label == limiting_tier and not limiting_filter(segment.value):
+            continue
+        events.append((segment.start_time, 2 * index, label, 1))
+        events.append((segment.end_time, 2 * index + 1, label, -1))
+    events.sort()
+    active = defaultdict(int)
+    for (timestamp, _, label, change) in events:
+        if change > 0 and active[label]:
+            logging.warning('Found overlapping segments in tier "%s" at time %s',
+                            label, timestamp)
+        active[label] += change
+
+# ------------------------------------------------------------------------------
+def get_preclipped_events(labelled_segments, masking_tiers = [],
+                          limiting_tier = None,
+                          limiting_annotation_regex = '.*',
+                          negate_limiting_annotation_regex = False):
+    """
+    Given a list of `(label, Segment)` pairs (in the order `get_events` would
+    see them), return the sorted list of `Event` objects that `process_events`
+    needs to produce the same results, leaving out any time that can't be
+    counted. Returns `None` if the segments can't be pre-clipped.
+
+    The warnings about overlapping segments that the full sweep would give
+    are logged here, so the events should be processed with `warn_overlaps`
+    turned off.
+
+    The "allowed" time is the (closed) union of the matching limiting tier
+    segments, minus the interiors of the masking tier segments. Limiting and
+    masking segments are kept whole if they touch the limiting union at all;
+    the other segments are dropped if they don't touch the allowed time, and
+    clipped to it otherwise. A clipped start is put before any other events
+    with the same timestamp, and a clipped end after them, so that the set of
+    active tiers at each remaining event is the same as in the full sweep.
+    """
+    limiting_filter = get_limiting_filter(limiting_annotation_regex,
+                                          negate_limiting_annotation_regex)
+    limits = []
+    masks = []
+    # The latest end time so far of each label's segments, and the labels with
+    # a segment that starts before that (which may overlap)
+    last_ends = dict()
+    overlapping = set()
+    for (label, segment) in labelled_segments:
+        if segment.start_time > segment.end_time:
+            # The full sweep's handling of these depends on event order
+            return None
+        if label == limiting_tier:
+            if not limiting_filter(segment.value):
+                continue
+            limits.append((segment.start_time, segment.end_time))
+        elif label in masking_tiers and segment.start_time < segment.end_time:
+            masks.append((segment.start_time, segment.end_time))
+        last_end = last_ends.get(label)
+        if last_end is not None and segment.start_time < last_end:
+            overlapping.add(label)
+        if last_end is None or segment.end_time > last_end:
+            last_ends[label] = segment.end_time
+
+    # Clipping moves or drops the events of overlapping segments, so the
+    # warnings about them are given here instead of by `process_events`
+    if overlapping:
+        warn_overlapping_segments(labelled_segments, overlapping,
+                                  limiting_tier, limiting_filter)
+
+    if limiting_tier:
+        limits = merge_intervals(limits)
+        source = limits
+    else:
+        limits = None
+        source = [[float('-inf'), float('inf')]]
+
+    # Subtract the (open) masking intervals from the limiting intervals with a
+    # linear merge of the two sorted lists
+    masks = merge_intervals(masks, touching = False)
+    allowed = []
+    index = 0
+    for (start, end) in source:
+        while index < len(masks) and masks[index][1] <= start:
+            index += 1
+        i = index
+        while i < len(masks) and masks[i][0] < end:
+            (mask_start, mask_end) = masks[i]
+            if mask_start >= start:
+                allowed.append([start, mask_start])
+            start = max(start, mask_end)
+            i += 1
+        if start <= end:
+            allowed.append([start, end])
+    logging.debug('Allowed intervals: {:,}'.format(len(allowed)))
+
+    limit_ends = [end for (_, end) in limits] if limits is not None else None
+    allowed_ends = [end for (_, end) in allowed]
+
+    # Each event is tagged with a rank that orders it among the events with
+    # the same timestamp: 0 for clipped starts, 1 for unchanged events, and 2
+    # for clipped ends
+    keyed_events = []
+    def _add(segment, label, start_time, end_time, start_rank, end_rank):
+        keyed_events.append((start_time, start_rank,
+                             Event(timestamp  = start_time,
+                                   label      = label,
+                                   annotation = segment.value,
+                                   start      = True)))
+        keyed_events.append((end_time, end_rank,
+                             Event(timestamp  = end_time,
+                                   label      = label,
+                                   annotation = segment.value,
+                                   start      = False)))
+
+    last_start = None
+    index = 0
+    for (label, segment) in labelled_segments:
+        (start_time, end_time) = (segment.start_time, segment.end_time)
+        if label == limiting_tier or label in masking_tiers:
+            if limits is not None:
+                i = bisect.bisect_left(limit_ends, start_time)
+                if i == len(limits) or limits[i][0] > end_time:
+                    continue
+            _add(segment, label, start_time, end_time, 1, 1)
+            continue
+
+        # Find the first allowed interval that doesn't end before this
+        # segment starts; segments within a tier are normally in order, so
+        # this is usually a short step forward from the last one
+        if last_start is None or start_time < last_start:
+            index = bisect.bisect_left(allowed_ends, start_time)
+        while index < len(allowed) and allowed[index][1] < start_time:
+            index += 1
+        last_start = start_time
+
+        i = index
+        while i < len(allowed) and allowed[i][0] <= end_time:
+            (allowed_start, allowed_end) = allowed[i]
+            clipped_start = max(start_time, allowed_start)
+            clipped_end = min(end_time, allowed_end)
+            _add(segment, label, clipped_start, clipped_end,
+                 0 if clipped_start > start_time else 1,
+                 2 if clipped_end < end_time else 1)
+            i += 1
+
+    keyed_events.sort(key = lambda k: (k[0], k[1]))
+    return [event for (_, _, event) in keyed_events]
+
 # ------------------------------------------------------------------------------
 def process_events(events, masking_tiers = [],
                    limiting_tier = None,
                    limiting_annotation_regex = '.*',
-                   negate_limiting_annotation_regex = False):
-    """Process a sorted list of `Event` objects."""
+                   negate_limiting_annotation_regex = False,
+                   overlap = None, turns = None,
+                   chunks = 1, chunk_processes = None,
+                   initial_state = None, warn_overlaps = True):
+    """
+    Process a sorted list of `Event` objects. If `overlap` is given, the
+    counted sections are also added to that `OverlapStats` object, and if
+    `turns` is given, each event is added to that `TurnStats` object. Unless
+    `warn_overlaps` is turned off (for pre-clipped events, for which
+    `get_preclipped_events` gives them), a warning is logged for each segment
+    that starts while another one of its tier is active.
+
+    With `chunks` > 1, the timeline is split into that many chunks, which are
+    processed separately (see `process_events_chunked`), unless turns are
+    being counted: their state can't be split, so the events are then
+    processed in a single pass. A chunk starts from `initial_state`, the list
+    of active tiers and the section start time.
+    """
+    if chunks > 1 and turns is None:
+        return process_events_chunked(events, chunks, chunk_processes,
+                                      masking_tiers = masking_tiers,
+                                      limiting_tier = limiting_tier,
+                                      limiting_annotation_regex = limiting_annotation_regex,
+                                      negate_limiting_annotation_regex = negate_limiting_annotation_regex,
+                                      overlap = overlap,
+                                      warn_overlaps = warn_overlaps)
+
+    limiting_filter = get_limiting_filter(limiting_annotation_regex,
+                                          negate_limiting_annotation_regex)
 
     # Initialize return values
     union_sum      = 0
@@ -148,6 +967,9 @@ def process_events(events, masking_tiers = [],
     section_tiers = []
     # Ignore any uncategorized space before the first event
     section_start = events[0].timestamp
+    if initial_state is not None:
+        (section_tiers, section_start) = initial_state
+        section_tiers = list(section_tiers)
 
     # Sort events chronologically
     events.sort(key = lambda event: event.timestamp)
@@ -161,7 +983,8 @@ def process_events(events, masking_tiers = [],
         section_label_components = set(section_tiers)
         if limiting_tier and limiting_tier in section_label_components:
             section_label_components.remove(limiting_tier)
-        section_label = '+'.join(sorted(section_label_components))
+        section_label_tiers = sorted(section_label_components)
+        section_label = '+'.join(section_label_tiers)
 
         mask_section = False
 
@@ -179,20 +1002,22 @@ def process_events(events, masking_tiers = [],
             section_duration = event.timestamp - section_start
             section_sums[section_label] += section_duration
             union_sum += section_duration
+            if overlap is not None:
+                overlap.add(section_label_tiers, section_duration)
+
+        if turns is not None:
+            turns.add(event, section_tiers)
 
         # If this event is for the limiting tier, we check its annotation for a
         # match, and based on that, we decide whether or not to ignore it.
         if event.label == limiting_tier:
-            update_tier = bool(re.search(limiting_annotation_regex, event.annotation))
-            if negate_limiting_annotation_regex:
-                update_tier = not update_tier
-            if not update_tier:
+            if not limiting_filter(event.annotation):
                 continue
 
         # Either a new label started, or an existing one ended. Either
         # way, we need to update the list of current labels.
         if event.change > 0:
-            if event.label in section_tiers:
+            if warn_overlaps and event.label in section_tiers:
                 logging.warning('Found overlapping segments in tier "%s" at time %s',
                                 event.label, event.timestamp)
             section_tiers.append(event.label)
@@ -204,13 +1029,18 @@ def process_events(events, masking_tiers = [],
         if section_tiers:
             section_start = event.timestamp
 
+    if turns is not None:
+        turns.flush(section_tiers)
+
     return union_sum, section_sums
 
 # ------------------------------------------------------------------------------
 def process_category(category, events, labels, output_records,
                      masking_tiers = [], limiting_tier = None,
                      limiting_regex = '.*',
-                     negate_regex = False):
+                     negate_regex = False,
+                     chunks = 1, chunk_processes = None,
+                     warn_overlaps = True):
     """Utility function for adding XDS values to output records"""
     if len(events) == 0: return
     for event in events:
@@ -219,7 +1049,10 @@ def process_category(category, events, labels, output_records,
                                        masking_tiers = masking_tiers,
                                        limiting_tier = limiting_tier,
                                        limiting_annotation_regex = limiting_regex,
-                                       negate_limiting_annotation_regex = negate_regex)
+                                       negate_limiting_annotation_regex = negate_regex,
+                                       chunks = chunks,
+                                       chunk_processes = chunk_processes,
+                                       warn_overlaps = warn_overlaps)
     logging.debug('{} sections found: {}'.format(
         category.upper(), section_sums.keys()
     ))
@@ -228,131 +1061,184 @@ def process_category(category, events, labels, output_records,
         output_records['totals'].data[category] += section_sums[label]
     return
 
-# ==============================================================================
-# Command-line parser
 # ------------------------------------------------------------------------------
-parser = argparse.ArgumentParser(
-    formatter_class = argparse.RawDescriptionHelpFormatter,
-    description = "Analyze and report the annotated time segments for tiers in EAF files.",
-    epilog =
-    "Examples:\n" +
-    "    {} -o foo.csv raw_FOO/*.eaf\n".format(__file__) +
-    "    {} --ignore-tiers EE1 UC1 -- raw_FOO/*.eaf\n\n".format(__file__) +
-    "[When using --ignore-tiers, separate tier names from EAF file names with '--'.]"
-)
-
-parser.add_argument('-o', '--output',
-                    metavar = '<csv_file>',
-                    type    = argparse.FileType('w'),
-                    default = 'eaf-counts.csv',
-                    help    = "Write output to <csv_file> (default: '%(default)s')")
-
-parser.add_argument('-d', '--delimiter',
-                    choices = ['tab', 'comma', 'ascii'],
-                    default = 'comma',
-                    help    = "Use <delimiter> as CSV output field separator (default: '%(default)s')")
-
-parser.add_argument('-i', '--ignore-tiers',
-                    dest    = 'ignore',
-                    metavar = '<tier>',
-                    nargs   = '+',
-                    default = [],
-                    help    = "List of one or more additional EAF tiers to ignore (space separated list)")
-
-parser.add_argument('-m', '--masking-tiers',
-                    dest    = 'mask',
-                    metavar = '<tier>',
-                    nargs   = '+',
-                    default = [],
-                    help    = "List of one or more EAF tiers to use as a mask (space separated list)")
-
-parser.add_argument('-l', '--limiting-tier',
-                    dest    = 'limiting_tier',
-                    metavar = '<tier>',
-                    default = None,
-                    help    = "The name of an EAF tier to be used to limit the scope of processed segments")
-
-parser.add_argument('-p', '--limiting-tier-pattern',
-                    dest    = 'limiting_tier_pattern',
-                    metavar = '<regex>',
-                    default = '.*',
-                    help    = "A regex to match on the annotation labels for the limiting tier")
-
-parser.add_argument('-x', '--negate-limiting-tier-pattern',
-                    dest    = 'negate_pattern',
-                    action  = 'store_true',
-                    help    = """Match all sections of limiting tier that don't match the pattern instead of
-                    ones that do""")
-
-parser.add_argument('--no-xds',
-                    dest    = 'xds',
-                    action  = 'store_false',
-                    help    = "Don't summarize ADS & CDS amounts")
-
-parser.add_argument('--no-overlap',
-                    dest    = 'overlap',
-                    action  = 'store_false',
-                    help    = "Don't include tier overlap details in output")
-
-parser.add_argument('--no-totals',
-                    dest    = 'totals',
-                    action  = 'store_false',
-                    help    = "Don't include Totals row(s) in output table")
+# The sorted events of the sweep being split into chunks. Worker processes
+# started with `fork` inherit these, so only the chunk boundaries and starting
+# states need to be sent to them.
+chunk_events = None
 
-parser.add_argument('-v', '--verbose',
-                    action  = 'count',
-                    default = 0,
-                    help    = """
-                    Write status messages to STDERR while processing. Use multiple
-                    times to increase verbosity. Beware of using more than two; output
-                    will be extremely verbose.""")
+def get_chunk_states(events, boundaries, section_start, limiting_tier, limiting_filter):
+    """
+    Given a sorted list of events and a list of chunk boundaries (indices into
+    `events`), return the state of `process_events` at each boundary: the
+    list of active tiers, and the start time of the current section (which
+    starts out as `section_start`). Returns `None` if an end event is found
+    for a tier that isn't active (for which `process_events` raises an
+    exception).
+    """
+    counts = defaultdict(int)
+    active = 0
+    states = []
+    boundaries = iter(boundaries)
+    boundary = next(boundaries, None)
+    for (index, event) in enumerate(events):
+        while index == boundary:
+            section_tiers = []
+            for (tier, count) in counts.items():
+                section_tiers.extend([tier] * count)
+            states.append((section_tiers, section_start))
+            boundary = next(boundaries, None)
+        if event.label == limiting_tier and not limiting_filter(event.annotation):
+            continue
+        if event.change > 0:
+            counts[event.label] += 1
+            active += 1
+        else:
+            if counts[event.label] == 0:
+                return None
+            counts[event.label] -= 1
+            active -= 1
+        if active:
+            section_start = event.timestamp
+    return states
+
+def sweep_chunk(job):
+    """Process one chunk of events, for `process_events_chunked`"""
+    (start, end, initial_state, events, options) = job
+    if events is None:
+        events = chunk_events[start:end]
+    overlap = OverlapStats() if options['overlap'] else None
+    (union_sum, section_sums) = process_events(events,
+                                               masking_tiers = options['masking_tiers'],
+                                               limiting_tier = options['limiting_tier'],
+                                               limiting_annotation_regex = options['regex'],
+                                               negate_limiting_annotation_regex = options['negate'],
+                                               overlap = overlap,
+                                               initial_state = initial_state,
+                                               warn_overlaps = options['warn_overlaps'])
+    return union_sum, section_sums, overlap
+
+def process_events_chunked(events, chunks, processes = None,
+                           masking_tiers = [],
+                           limiting_tier = None,
+                           limiting_annotation_regex = '.*',
+                           negate_limiting_annotation_regex = False,
+                           overlap = None, warn_overlaps = True):
+    """
+    Process a list of `Event` objects like `process_events`, but split the
+    sorted events into `chunks` consecutive time ranges, which are processed
+    by up to `processes` worker processes (default: one per CPU), and merge
+    the results. The starting state of each chunk comes from a single prefix
+    pass over the events, so the results are exactly the same as those of
+    `process_events`.
+    """
+    global chunk_events
 
-parser.add_argument('eaf_files',
-                    metavar = '<eaf_file>',
-                    nargs   = '+',
-                    help    = "The name(s) of the EAF file(s) to process")
+    # As in `process_events`, the first section starts at the first event in
+    # the list as given (before sorting)
+    first_timestamp = events[0].timestamp
+    events.sort(key = lambda event: event.timestamp)
 
-args = parser.parse_args()
+    # Split the events into chunks of about the same size, without splitting
+    # up events with the same timestamp
+    boundaries = [0]
+    for chunk in range(1, chunks):
+        index = max(boundaries[-1], len(events) * chunk // chunks)
+        while (0 < index < len(events) and
+               events[index].timestamp == events[index - 1].timestamp):
+            index += 1
+        if index > boundaries[-1] and index < len(events):
+            boundaries.append(index)
+    limiting_filter = get_limiting_filter(limiting_annotation_regex,
+                                          negate_limiting_annotation_regex)
+    states = get_chunk_states(events, boundaries, first_timestamp,
+                              limiting_tier, limiting_filter)
+    if states is None or len(boundaries) == 1:
+        return process_events(events,
+                              masking_tiers = masking_tiers,
+                              limiting_tier = limiting_tier,
+                              limiting_annotation_regex = limiting_annotation_regex,
+                              negate_limiting_annotation_regex = negate_limiting_annotation_regex,
+                              overlap = overlap,
+                              initial_state = ([], first_timestamp),
+                              warn_overlaps = warn_overlaps)
+    logging.debug('Processing {:,} events in {} chunks'.format(
+        len(events), len(boundaries)))
+
+    options = {
+        'masking_tiers': masking_tiers,
+        'limiting_tier': limiting_tier,
+        'regex'        : limiting_annotation_regex,
+        'negate'       : negate_limiting_annotation_regex,
+        'overlap'      : overlap is not None,
+        'warn_overlaps': warn_overlaps,
+    }
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    processes = min(processes, len(boundaries))
+    # Worker processes can't start worker processes of their own (e.g. with
+    # `--jobs`), so in that case the chunks are processed one at a time
+    if multiprocessing.current_process().daemon:
+        processes = 1
+    try:
+        forked = multiprocessing.get_start_method() == 'fork'
+    except AttributeError:
+        forked = os.name == 'posix'
+    forked = forked and processes > 1
+
+    jobs = []
+    ends = boundaries[1:] + [len(events)]
+    for (start, end, state) in zip(boundaries, ends, states):
+        jobs.append((start, end, state,
+                     None if forked else events[start:end], options))
+
+    if processes > 1:
+        chunk_events = events
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(sweep_chunk, jobs)
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+            chunk_events = None
+    else:
+        results = list(map(sweep_chunk, jobs))
+
+    # Merge the results of the chunks
+    union_sum = 0
+    section_sums = defaultdict(int)
+    for (chunk_union_sum, chunk_section_sums, chunk_overlap) in results:
+        union_sum += chunk_union_sum
+        for (label, value) in chunk_section_sums.items():
+            section_sums[label] += value
+        if overlap is not None:
+            overlap.merge(chunk_overlap)
+    return union_sum, section_sums
 
-# ==============================================================================
-# Finalize options, initialize output
 # ------------------------------------------------------------------------------
-logging.VERBOSE = 5
-log_levels = [logging.WARNING, logging.INFO, logging.DEBUG, logging.VERBOSE]
-log_level = log_levels[min(args.verbose, len(log_levels) - 1)]
-
-logging.basicConfig(level  = log_level,
-                    format = '%(levelname)s %(message)s')
-
-ignored_tiers = set(['code', 'code_num', 'on_off', 'context'])
-ignored_tiers.update(args.ignore)
-if args.limiting_tier and args.limiting_tier in ignored_tiers:
-    ignored_tiers.remove(args.limiting_tier)
-logging.info('Ignoring tiers: {}'.format(ignored_tiers))
-
-output_delimiter = '\t'
-if args.delimiter == 'comma':
-    output_delimiter = ','
-elif args.delimiter == 'ascii':
-    output_delimiter = '\x1f'
-
-# Set up output csv writer
-output = csv.writer(args.output,
-                    delimiter      = output_delimiter,
-                    quoting        = csv.QUOTE_MINIMAL,
-                    lineterminator = '\n')
-# Write headers
-output.writerow(OutputRecord.header)
-logging.debug('Writing output header')
-
-grand_totals = OutputRecord('*', 'Grand Totals')
+def get_chunk_count(args, events):
+    """
+    Return the number of chunks to split the processing of `events` into, so
+    that no chunk has fewer than `--min-chunk-events` events
+    """
+    if args.chunks <= 1:
+        return 1
+    return max(1, min(args.chunks, len(events) // max(1, args.min_chunk_events)))
 
-# ==============================================================================
-# Start processing EAF files
 # ------------------------------------------------------------------------------
-for eaf_file in args.eaf_files:
-    logging.info('Processing {}'.format(eaf_file))
-    file_id = os.path.basename(eaf_file).replace('.eaf', '')
+# Input backends for formats other than EAF, by (lower case) file name
+# extension; files with any other extension are parsed as EAF files by `pympi`
+input_backends = {
+    '.rttm': RttmFile,
+    '.textgrid': TextGridFile,
+}
+
+def read_input_file(file_name):
+    """Parse an input file, using the backend for its file name extension"""
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension in input_backends:
+        return input_backends[extension](file_name)
 
     # If the EAF file version is >2.8, pympi 1.69 won't recognize
     # them, and issues a warning. We assume here that the data we have
@@ -362,16 +1248,112 @@ for eaf_file in args.eaf_files:
                             'Parsing unknown version of ELAN spec... '
                             'This could result in errors...')
     # Initialize the EAF file parser
-    eaf = pympi.Elan.Eaf(eaf_file)
+    eaf = pympi.Elan.Eaf(file_name)
     warnings.filterwarnings('default')
+    return eaf
 
-    # Get tier names from EAF file
+# ------------------------------------------------------------------------------
+def get_recordings(eaf, file_id):
+    """
+    Return the list of `(file_id, eaf)` pairs to be summarized for a parsed
+    input file: just the file itself, unless it is an RTTM file with segments
+    from more than one recording, in which case each recording is summarized
+    separately, with its recording ID as its file ID.
+    """
+    if isinstance(eaf, RttmFile) and len(eaf.recordings) > 1:
+        return list(eaf.recordings)
+    return [(file_id, eaf)]
+
+# ------------------------------------------------------------------------------
+def get_base_tiers(eaf):
+    """
+    Return the set of tiers to be summarized in a parsed input file: the tiers
+    with sub-tiers (for example, `FA1` for `xds@FA1`). Files in other formats
+    often have no sub-tiers (such as the speakers of an RTTM file), in which
+    case all of their tiers are used.
+    """
     all_tiers = eaf.get_tier_names()
-    logging.debug('All tiers: {}'.format(list(all_tiers)))
     # Filter out tiers with no sub-tiers by selecting only sub-tiers, then
     # stripping out all but the last (base) element in the tier name
     tiers = set(map(lambda t: t.split('@')[-1],
                     filter(lambda t: '@' in t, all_tiers)))
+    if not tiers and isinstance(eaf, SegmentFile):
+        tiers = set(all_tiers)
+    return tiers
+
+# ------------------------------------------------------------------------------
+def get_file_id(file_name):
+    """Return the ID used in the output table for an input file name"""
+    file_id = os.path.basename(file_name)
+    (base, extension) = os.path.splitext(file_id)
+    if extension.lower() in input_backends:
+        return base
+    return file_id.replace('.eaf', '')
+
+# ------------------------------------------------------------------------------
+def read_manifest(manifest_file, key_column):
+    """
+    Read a metadata manifest (a CSV file with a header row) mapping file IDs to
+    group columns. Returns the list of group column names and a dictionary
+    indexed by file ID, so that each EAF file's groups can be looked up directly.
+    """
+    with open(manifest_file) as manifest:
+        sample = manifest.readline()
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters = ',\t;')
+        except csv.Error:
+            # For example, a header with a single column
+            dialect = csv.excel
+        manifest.seek(0)
+        reader = csv.DictReader(manifest, dialect = dialect)
+        if key_column not in reader.fieldnames:
+            raise ValueError('Manifest {} has no "{}" column'.format(
+                manifest_file, key_column))
+        columns = [c for c in reader.fieldnames if c != key_column]
+        index = dict()
+        for record in reader:
+            # Short rows have `None` for their missing cells
+            missing = [c for c in reader.fieldnames if record[c] is None]
+            if missing:
+                logging.warning('Manifest %s line %d has no value for %s',
+                                manifest_file, reader.line_num, ', '.join(missing))
+                if key_column in missing:
+                    continue
+                for column in missing:
+                    record[column] = ''
+            file_id = get_file_id(record[key_column])
+            if file_id in index:
+                logging.warning('Duplicate manifest entry for file %s', file_id)
+            index[file_id] = record
+    return columns, index
+
+# ------------------------------------------------------------------------------
+def get_ignored_tiers(args):
+    """Return the set of tier names to be left out of the summary"""
+    ignored_tiers = set(['code', 'code_num', 'on_off', 'context'])
+    ignored_tiers.update(args.ignore)
+    if args.limiting_tier and args.limiting_tier in ignored_tiers:
+        ignored_tiers.remove(args.limiting_tier)
+    return ignored_tiers
+
+# ==============================================================================
+# Per-file summary
+# ------------------------------------------------------------------------------
+def summarize_eaf(eaf, file_id, args, ignored_tiers, stats=None, overlap=None):
+    """
+    Compute the output rows for a single parsed EAF file object (or
+    `SegmentFile` for another input format). Returns the list of rows to be
+    written (in order) and the dictionary of all of the file's output records,
+    whether or not they are written (the `Totals` record is keyed by
+    `totals`), or `([], None)` if no matching annotated segments were found. If
+    `stats` is given, counts of the segments read are added to it, and if
+    `overlap` (an `OverlapStats` object) is given, the pairwise overlap and
+    overlap order totals are added to that.
+    """
+    # Get tier names from EAF file
+    all_tiers = eaf.get_tier_names()
+    logging.debug('All tiers: {}'.format(list(all_tiers)))
+    tiers = get_base_tiers(eaf)
     logging.debug('Tiers with sub-tiers: {}'.format(tiers))
 
     # Add limiting tier, if it doesn't have any sub-tiers
@@ -387,22 +1369,84 @@ for eaf_file in args.eaf_files:
     # Extract annotated segments from EAF
     segments = get_segments(eaf, tiers)
     logging.debug('Found {:,} segments'.format(len(segments)))
+    if stats is not None:
+        stats['segments'] += len(segments)
+
+    # Join segments separated by short pauses, and drop short fragments; the
+    # limiting tier's segments are only joined if their annotations match
+    limiting_tiers = [args.limiting_tier] if args.limiting_tier else []
+    segments = bridge_segments(segments, args.bridge_gaps, args.min_duration,
+                               limiting_tiers, stats)
 
     if len(segments) == 0:
         logging.warning('No matching annotated segments found in file %s',
-                        eaf_file)
-        continue
+                        file_id)
+        return [], None
+
+    # XDS event labels are the base tier name with the annotation code
+    # appended (for example: `xds@FA1` with a `C` code becomes `FA1:C`), and
+    # these select the segments for the CDS, ADS, and BOTH categories
+    xds_label = lambda x: x.tier.split('@')[-1] + ':' + x.value
+    xds_categories = {
+        'cds': lambda label: ':C' in label or ':T' in label,
+        'ads': lambda label: ':A' in label,
+        'both': lambda label: ':B' in label,
+    }
+
+    # If only part of the timeline can be counted, leave out the rest before
+    # making events. Turns can answer segments outside that part, so the
+    # main sweep needs all the events if they are being counted.
+    pre_clip = args.pre_clip and (args.mask or args.limiting_tier)
+    events = None
+    preclipped = False
+    if pre_clip and not args.turns:
+        events = get_preclipped_events([(s.tier, s) for s in segments],
+                                       masking_tiers = args.mask,
+                                       limiting_tier = args.limiting_tier,
+                                       limiting_annotation_regex = args.limiting_tier_pattern,
+                                       negate_limiting_annotation_regex = args.negate_pattern)
+        if events is not None:
+            preclipped = True
+            logging.debug('Pre-clipped {:,} segments to {:,} events'.format(
+                len(segments), len(events)))
 
     # Convert segments (with start & end times) to events (with either
     # a start or end timestamp, but not both)
-    events = get_events(segments)
+    if events is None:
+        events = get_events(segments)
+
+    # Count turns in the same sweep; its state can't be split into chunks
+    turns = None
+    chunks = get_chunk_count(args, events)
+    if args.turns:
+        turns = TurnStats(args.child_tiers, args.adult_tiers, args.turn_window,
+                          cds_only = args.cds_turns_only,
+                          masking_tiers = args.mask,
+                          limiting_tier = args.limiting_tier)
+        chunks = 1
+        if args.cds_turns_only:
+            xds_tiers = [t for t in all_tiers
+                         if 'xds@' in t and t not in ignored_tiers]
+            cds_segments = [segment for segment in get_segments(eaf, xds_tiers)
+                            if xds_categories['cds'](xds_label(segment))]
+            mark_cds_events(events, cds_segments)
 
     # Calculate sums and overlap for each combination of tiers
-    (union_sum, section_sums) = process_events(events,
-                                               masking_tiers = args.mask,
-                                               limiting_tier = args.limiting_tier,
-                                               limiting_annotation_regex = args.limiting_tier_pattern,
-                                               negate_limiting_annotation_regex = args.negate_pattern)
+    if overlap is None and args.overlap_orders:
+        overlap = OverlapStats()
+    if events:
+        (union_sum, section_sums) = process_events(events,
+                                                   masking_tiers = args.mask,
+                                                   limiting_tier = args.limiting_tier,
+                                                   limiting_annotation_regex = args.limiting_tier_pattern,
+                                                   negate_limiting_annotation_regex = args.negate_pattern,
+                                                   overlap = overlap,
+                                                   turns = turns,
+                                                   chunks = chunks,
+                                                   chunk_processes = args.chunk_processes,
+                                                   warn_overlaps = not preclipped)
+    else:
+        (union_sum, section_sums) = (0, defaultdict(int))
     logging.debug('Union sum: {:,} ms'.format(union_sum))
     logging.debug('Found {:,} section types'.format(len(section_sums)))
 
@@ -436,9 +1480,15 @@ for eaf_file in args.eaf_files:
                 output_records[tier].data['total'] += section_sums[label]
                 output_records['totals'].data['total'] += section_sums[label]
 
+    if turns is not None:
+        turns.add_to_records(output_records, file_id)
+
     # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
     # If we're reporting ADS & CDS data:
     if args.xds:
+        # The base tiers' segments have already been counted in `stats`
+        counted_tiers = set(tiers)
+
         # Get the list of tiers, including sub-tiers, but excluding
         # the ignored ones
         tiers = list(filter(lambda t: t not in ignored_tiers,
@@ -453,75 +1503,579 @@ for eaf_file in args.eaf_files:
         # Extract annotated segment data for the XDS tiers
         segments = get_segments(eaf, xds_tiers)
         logging.debug('Found {:,} XDS segments'.format(len(segments)))
-
-        # Convert segments to events list, setting the event labels to
-        # the base tier name with the annotation code appended (for
-        # example: `xds@FA1` with a `C` code becomes `FA1:C`)
-        events = get_events(
-            segments, lambda x: x.tier.split('@')[-1] + ':' + x.value)
-
-        # Create filtered lists corresponding to ADS, CDS, and BOTH annotations
-        # logging.debug('Events found: CDS: {}, ADS: {}, BOTH: {}'.format(
-        #     len(cds_events), len(ads_events), len(both_events)
-        # ))
-        xds_events = {
-            'cds': list(filter(lambda x: ':C' in x.label or ':T' in x.label, events)),
-            'ads': list(filter(lambda x: ':A' in x.label, events)),
-            'both': list(filter(lambda x: ':B' in x.label, events)),
-        }
-        for key, value in xds_events.items():
-            logging.debug('{} events found: {}'.format(key.upper(), len(value)))
+        if stats is not None:
+            stats['segments'] += len(segments)
+        segments = bridge_segments(segments, args.bridge_gaps, args.min_duration,
+                                   xds_tiers, stats)
 
         # If we're masking segments, get the segments that will be used
         logging.debug('Masking tiers: {}'.format(args.mask))
-        masking_segments = get_segments(eaf, args.mask)
-        masking_events = get_events(masking_segments)
-
-        # If there's a limiting tier, get the segments for that tier
+        masking_segments = []
+        for tier in args.mask:
+            masking_segments.extend(bridge_segments(
+                get_segments(eaf, [tier]), args.bridge_gaps, args.min_duration, (),
+                None if tier in counted_tiers else stats))
+
+        # If there's a limiting tier, get the segments for that tier (it is
+        # always one of the base tiers)
         if args.limiting_tier:
             limiting_segments = get_segments(eaf, [args.limiting_tier])
-            limiting_events = get_events(limiting_segments)
+            limiting_segments = bridge_segments(limiting_segments, args.bridge_gaps,
+                                                args.min_duration, limiting_tiers)
+        else:
+            limiting_segments = []
+
+        xds_events = dict()
+        if pre_clip:
+            other_segments = [(s.tier.split(':')[0], s)
+                              for s in masking_segments + limiting_segments]
+            for code, matches in xds_categories.items():
+                labelled_segments = []
+                for segment in segments:
+                    label = xds_label(segment)
+                    if matches(label):
+                        labelled_segments.append((label.split(':')[0], segment))
+                xds_events[code] = get_preclipped_events(
+                    labelled_segments + other_segments,
+                    masking_tiers = args.mask,
+                    limiting_tier = args.limiting_tier,
+                    limiting_annotation_regex = args.limiting_tier_pattern,
+                    negate_limiting_annotation_regex = args.negate_pattern)
+
+        # Convert segments to events lists for any categories that weren't
+        # pre-clipped
+        preclipped = set(code for (code, events) in xds_events.items()
+                         if events is not None)
+        if None not in xds_events.values() and pre_clip:
+            # `get_events` isn't called, so warn about reversed segments (even
+            # those with codes that aren't in any category) as it would
+            for segment in segments:
+                if segment.start_time > segment.end_time:
+                    logging.warning('Found segment with start time (%s) > end time (%s)',
+                                    segment.start_time, segment.end_time)
         else:
-            limiting_events = []
+            events = get_events(segments, xds_label)
+            masking_events = get_events(masking_segments)
+            limiting_events = get_events(limiting_segments)
+            for code, matches in xds_categories.items():
+                if xds_events.get(code) is None:
+                    xds_events[code] = list(filter(lambda x: matches(x.label), events))
+                    xds_events[code].extend(masking_events)
+                    xds_events[code].extend(limiting_events)
 
         for code, events in xds_events.items():
-            events.extend(masking_events)
-            events.extend(limiting_events)
+            logging.debug('{} events found: {}'.format(code.upper(), len(events)))
             process_category(code, events, labels, output_records,
                              masking_tiers = args.mask,
                              limiting_tier = args.limiting_tier,
                              limiting_regex = args.limiting_tier_pattern,
-                             negate_regex = args.negate_pattern)
+                             negate_regex = args.negate_pattern,
+                             chunks = get_chunk_count(args, events),
+                             chunk_processes = args.chunk_processes,
+                             warn_overlaps = code not in preclipped)
 
     # Get the list of labels for all output records
     labels = sorted(output_records.keys())
     labels.remove('totals')
 
+    rows = []
+    (data_labels, _) = OutputRecord.columns(args)
+
     # Report on top-level tiers on their own first
     for label in filter(lambda x: x in tiers, labels):
-        output.writerow(output_records[label].fmt())
+        rows.append(output_records[label].fmt(data_labels))
 
     # If it has been requested, report overlap details for each
     # combination of tiers in the EAF file
     if args.overlap:
-        for label in filter(lambda x: x not in tiers, labels):
-            output.writerow(output_records[label].fmt())
+        combinations = list(filter(lambda x: x not in tiers, labels))
+        # Keep only the longest combinations, and fold the others into one
+        # row; `nlargest` keeps a heap of at most `max_combinations` labels
+        other = None
+        if args.max_combinations is not None and len(combinations) > args.max_combinations:
+            kept = set(heapq.nlargest(args.max_combinations, combinations,
+                                      key = lambda x: output_records[x].data['exclusive']))
+            other = OutputRecord(file_id, 'Other')
+            for label in combinations:
+                if label not in kept:
+                    for (category, value) in output_records[label].data.items():
+                        other.data[category] += value
+            logging.debug('Folding {:,} combinations into "Other"'.format(
+                len(combinations) - len(kept)))
+            combinations = [label for label in combinations if label in kept]
+        for label in combinations:
+            rows.append(output_records[label].fmt(data_labels))
+        if other is not None:
+            rows.append(other.fmt(data_labels))
+
+    # Report the time with one, two, or more tiers active
+    if args.overlap_orders:
+        for record in overlap.order_records(file_id):
+            rows.append(record.fmt(data_labels))
+
+    # Write the totals for the current EAF file, unless the user requested to
+    # suppress `Totals` rows
+    if args.totals:
+        rows.append(output_records['totals'].fmt(data_labels))
+
+    return rows, output_records
+
+# ------------------------------------------------------------------------------
+def process_file(eaf_file, args, ignored_tiers):
+    """
+    Parse and summarize one input file. Returns the file ID, a list with a
+    `(file_id, rows, records, overlap)` tuple for each recording in the file
+    (see `get_recordings`), holding the output rows and output records from
+    `summarize_eaf` and the pairwise overlap totals (if requested), the segment
+    counts, and the time taken (in seconds).
+    """
+    start_time = timer()
+    logging.info('Processing {}'.format(eaf_file))
+    file_id = get_file_id(eaf_file)
+    eaf = read_input_file(eaf_file)
+
+    stats = defaultdict(int)
+    recordings = []
+    for (recording_id, recording) in get_recordings(eaf, file_id):
+        overlap = OverlapStats() if args.overlap_matrix else None
+        (rows, records) = summarize_eaf(recording, recording_id, args, ignored_tiers,
+                                        stats, overlap)
+        recordings.append((recording_id, rows, records, overlap))
+    return file_id, recordings, stats, timer() - start_time
+
+# ------------------------------------------------------------------------------
+# Worker processes for `--jobs`: the options are set once per worker, and each
+# job is just the index and name of a file.
+worker_options = None
+
+def init_worker(args, ignored_tiers):
+    global worker_options
+    worker_options = (args, ignored_tiers)
+    # Workers that weren't forked from the main process don't have its filter
+    logger = logging.getLogger()
+    if args.progress == 'tty' and not any(isinstance(f, ProgressLineFilter)
+                                          for f in logger.filters):
+        logger.addFilter(ProgressLineFilter())
+
+def process_file_job(job):
+    (index, eaf_file) = job
+    (args, ignored_tiers) = worker_options
+    return index, process_file(eaf_file, args, ignored_tiers)
+
+# ------------------------------------------------------------------------------
+def process_files(eaf_files, args, ignored_tiers):
+    """
+    Generate `(index, result)` pairs for each of `eaf_files`, where `result` is
+    the return value of `process_file`. With more than one job, the files are
+    processed by a pool of worker processes, and the results are generated in
+    order of completion.
+    """
+    if args.jobs <= 1:
+        for (index, eaf_file) in enumerate(eaf_files):
+            yield index, process_file(eaf_file, args, ignored_tiers)
+        return
+
+    # The output files can't be (and needn't be) passed to the workers
+    worker_args = argparse.Namespace(**vars(args))
+    worker_args.output = None
+    worker_args.group_output = None
+    worker_args.overlap_matrix = args.overlap_matrix is not None
+    pool = multiprocessing.Pool(args.jobs, init_worker, (worker_args, ignored_tiers))
+    try:
+        for result in pool.imap_unordered(process_file_job, enumerate(eaf_files)):
+            yield result
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+
+# ==============================================================================
+# Command-line parser
+# ------------------------------------------------------------------------------
+parser = argparse.ArgumentParser(
+    formatter_class = argparse.RawDescriptionHelpFormatter,
+    description = "Analyze and report the annotated time segments for tiers in EAF files.",
+    epilog =
+    "Examples:\n" +
+    "    {} -o foo.csv raw_FOO/*.eaf\n".format(__file__) +
+    "    {} --ignore-tiers EE1 UC1 -- raw_FOO/*.eaf\n\n".format(__file__) +
+    "[When using --ignore-tiers, separate tier names from EAF file names with '--'.]"
+)
+
+parser.add_argument('-o', '--output',
+                    metavar = '<csv_file>',
+                    type    = argparse.FileType('w'),
+                    default = 'eaf-counts.csv',
+                    help    = "Write output to <csv_file> (default: '%(default)s')")
+
+parser.add_argument('-d', '--delimiter',
+                    choices = ['tab', 'comma', 'ascii'],
+                    default = 'comma',
+                    help    = "Use <delimiter> as CSV output field separator (default: '%(default)s')")
+
+parser.add_argument('-i', '--ignore-tiers',
+                    dest    = 'ignore',
+                    metavar = '<tier>',
+                    nargs   = '+',
+                    default = [],
+                    help    = "List of one or more additional EAF tiers to ignore (space separated list)")
+
+parser.add_argument('-m', '--masking-tiers',
+                    dest    = 'mask',
+                    metavar = '<tier>',
+                    nargs   = '+',
+                    default = [],
+                    help    = "List of one or more EAF tiers to use as a mask (space separated list)")
+
+parser.add_argument('-l', '--limiting-tier',
+                    dest    = 'limiting_tier',
+                    metavar = '<tier>',
+                    default = None,
+                    help    = "The name of an EAF tier to be used to limit the scope of processed segments")
+
+parser.add_argument('-p', '--limiting-tier-pattern',
+                    dest    = 'limiting_tier_pattern',
+                    metavar = '<regex>',
+                    default = '.*',
+                    help    = "A regex to match on the annotation labels for the limiting tier")
+
+parser.add_argument('-x', '--negate-limiting-tier-pattern',
+                    dest    = 'negate_pattern',
+                    action  = 'store_true',
+                    help    = """Match all sections of limiting tier that don't match the pattern instead of
+                    ones that do""")
+
+parser.add_argument('--bridge-gaps',
+                    metavar = '<ms>',
+                    type    = int,
+                    default = 0,
+                    help    = """Join segments of the same tier separated by pauses shorter than
+                    <ms> milliseconds""")
+
+parser.add_argument('--min-duration',
+                    metavar = '<ms>',
+                    type    = int,
+                    default = 0,
+                    help    = "Drop segments shorter than <ms> milliseconds (after joining)")
+
+parser.add_argument('--no-pre-clip',
+                    dest    = 'pre_clip',
+                    action  = 'store_false',
+                    help    = """Don't leave out segments outside the limiting tier (or inside
+                    masking tiers) before processing""")
+
+parser.add_argument('--no-xds',
+                    dest    = 'xds',
+                    action  = 'store_false',
+                    help    = "Don't summarize ADS & CDS amounts")
+
+parser.add_argument('--no-overlap',
+                    dest    = 'overlap',
+                    action  = 'store_false',
+                    help    = "Don't include tier overlap details in output")
+
+parser.add_argument('--max-combinations',
+                    metavar = '<n>',
+                    type    = int,
+                    default = None,
+                    help    = """Only report the <n> tier combinations with the most exclusive time
+                    for each file, adding up the rest in an 'Other' row""")
+
+parser.add_argument('--overlap-orders',
+                    action  = 'store_true',
+                    help    = "Report the time with one, two, or three or more tiers active")
+
+parser.add_argument('--overlap-matrix',
+                    metavar = '<csv_file>',
+                    type    = argparse.FileType('w'),
+                    default = None,
+                    help    = "Write the time each pair of tiers overlapped to <csv_file>")
+
+parser.add_argument('--turns',
+                    action  = 'store_true',
+                    help    = """Count conversational turns between the child and adult tiers, and
+                    their response latencies, in extra columns""")
+
+parser.add_argument('--turn-window',
+                    metavar = '<ms>',
+                    type    = int,
+                    default = 5000,
+                    help    = """Count a turn if a segment starts no more than <ms> milliseconds after
+                    the other group's last segment ends (default: %(default)s)""")
+
+parser.add_argument('--child-tiers',
+                    metavar = '<pattern>',
+                    nargs   = '+',
+                    default = ['CHI'],
+                    help    = "Names (or shell-style patterns) of the child tiers for --turns (default: %(default)s)")
+
+parser.add_argument('--adult-tiers',
+                    metavar = '<pattern>',
+                    nargs   = '+',
+                    default = ['FA*', 'MA*'],
+                    help    = "Names (or shell-style patterns) of the adult tiers for --turns (default: %(default)s)")
+
+parser.add_argument('--cds-turns-only',
+                    action  = 'store_true',
+                    help    = "Only count adult segments with CDS annotations for --turns")
+
+parser.add_argument('--no-totals',
+                    dest    = 'totals',
+                    action  = 'store_false',
+                    help    = "Don't include Totals row(s) in output table")
+
+parser.add_argument('--manifest',
+                    metavar = '<csv_file>',
+                    default = None,
+                    help    = """
+                    Read a metadata manifest from <csv_file> (with a header row),
+                    mapping file IDs to group columns (e.g. child, age bin, site),
+                    and write a table of totals and means for each group""")
+
+parser.add_argument('--manifest-key',
+                    metavar = '<column>',
+                    default = 'file_id',
+                    help    = "Name of the manifest column holding the file IDs (default: '%(default)s')")
+
+parser.add_argument('--group-by',
+                    metavar = '<column>',
+                    nargs   = '+',
+                    default = None,
+                    help    = """
+                    Manifest column(s) to group by, each reported separately; join
+                    column names with '+' to group by a combination (default: every
+                    manifest column)""")
 
-    # If the user requested to suppress `Totals` rows, move on to the next file
-    if not args.totals:
-        continue
+parser.add_argument('--group-output',
+                    metavar = '<csv_file>',
+                    type    = argparse.FileType('w'),
+                    default = None,
+                    help    = "Write the group table to <csv_file> (default: output file name with '-groups' added)")
+
+parser.add_argument('-j', '--jobs',
+                    metavar = '<n>',
+                    type    = int,
+                    default = 1,
+                    help    = "Process up to <n> EAF files in parallel (default: %(default)s)")
+
+parser.add_argument('--progress',
+                    choices = ['auto', 'tty', 'json', 'off'],
+                    default = 'auto',
+                    help    = """
+                    Report progress on STDERR as a status line ('tty') or as JSON
+                    lines for log files ('json'). The default ('%(default)s') uses
+                    'tty' if STDERR is a terminal and --verbose isn't used.""")
 
-    # Write the totals for the current EAF file
-    output.writerow(output_records['totals'].fmt())
+parser.add_argument('--progress-interval',
+                    metavar = '<seconds>',
+                    type    = float,
+                    default = None,
+                    help    = "Minimum time between progress reports (default: 0.25 for 'tty', 30 for 'json')")
+
+parser.add_argument('--chunks',
+                    metavar = '<n>',
+                    type    = int,
+                    default = 1,
+                    help    = """Split the timeline of each large EAF file into up to <n> chunks,
+                    which are processed in parallel""")
+
+parser.add_argument('--chunk-processes',
+                    metavar = '<n>',
+                    type    = int,
+                    default = None,
+                    help    = "Use up to <n> worker processes for the chunks of a file (default: one per CPU)")
+
+parser.add_argument('--min-chunk-events',
+                    metavar = '<n>',
+                    type    = int,
+                    default = 100000,
+                    help    = "Don't make chunks of fewer than <n> events (default: %(default)s)")
+
+parser.add_argument('-v', '--verbose',
+                    action  = 'count',
+                    default = 0,
+                    help    = """
+                    Write status messages to STDERR while processing. Use multiple
+                    times to increase verbosity. Beware of using more than two; output
+                    will be extremely verbose.""")
 
-    # Update the Grand Totals data for the set of EAF files being processed
-    for category in output_records['totals'].data.keys():
-        grand_totals.data[category] += output_records['totals'].data[category]
+parser.add_argument('eaf_files',
+                    metavar = '<eaf_file>',
+                    nargs   = '+',
+                    help    = """The name(s) of the EAF file(s) to process; files ending in .rttm or
+                    .TextGrid are read as RTTM or Praat TextGrid files""")
 
+# ==============================================================================
+# Main program
 # ------------------------------------------------------------------------------
-# Finally, write the Grand Totals row if multiple files were processed
-if args.totals and len(args.eaf_files) > 1:
-    output.writerow(grand_totals.fmt())
-args.output.close()
+def main():
+    args = parser.parse_args()
+    if args.max_combinations is not None and args.max_combinations < 0:
+        parser.error('--max-combinations must be at least 0')
+
+    # ==========================================================================
+    # Finalize options, initialize output
+    # --------------------------------------------------------------------------
+    log_levels = [logging.WARNING, logging.INFO, logging.DEBUG, logging.VERBOSE]
+    log_level = log_levels[min(args.verbose, len(log_levels) - 1)]
+
+    logging.basicConfig(level  = log_level,
+                        format = '%(levelname)s %(message)s')
+
+    ignored_tiers = get_ignored_tiers(args)
+    logging.info('Ignoring tiers: {}'.format(ignored_tiers))
+
+    output_delimiter = '\t'
+    if args.delimiter == 'comma':
+        output_delimiter = ','
+    elif args.delimiter == 'ascii':
+        output_delimiter = '\x1f'
+
+    # Set up output csv writer
+    output = csv.writer(args.output,
+                        delimiter      = output_delimiter,
+                        quoting        = csv.QUOTE_MINIMAL,
+                        lineterminator = '\n')
+    # Write headers
+    (data_labels, header) = OutputRecord.columns(args)
+    output.writerow(header)
+    logging.debug('Writing output header')
+
+    grand_totals = OutputRecord('*', 'Grand Totals')
+
+    # Set up the pairwise overlap table, if requested
+    if args.overlap_matrix:
+        overlap_output = csv.writer(args.overlap_matrix,
+                                    delimiter      = output_delimiter,
+                                    quoting        = csv.QUOTE_MINIMAL,
+                                    lineterminator = '\n')
+        overlap_output.writerow(['File', 'Tier', 'Other Tier', 'Overlap'])
+        grand_overlap = OverlapStats()
+
+    # If there's a manifest, load it and set up the groups
+    groupings = []
+    if args.manifest:
+        (columns, manifest) = read_manifest(args.manifest, args.manifest_key)
+        logging.info('Read {:,} manifest entries'.format(len(manifest)))
+        for grouping in args.group_by or columns:
+            grouping = grouping.split('+')
+            for column in grouping:
+                if column not in columns:
+                    parser.error('No column "{}" in manifest {}'.format(
+                        column, args.manifest))
+            # A repeated grouping would add each file to its groups twice
+            if grouping not in groupings:
+                groupings.append(grouping)
+        if not groupings:
+            logging.warning('Manifest %s has no columns to group by', args.manifest)
+    groups = dict()
+
+    progress_mode = args.progress
+    if progress_mode == 'auto':
+        progress_mode = 'tty' if sys.stderr.isatty() and args.verbose == 0 else 'off'
+    args.progress = progress_mode
+    progress = None
+    if progress_mode == 'tty':
+        # Log messages (from the workers, too) erase the status line first
+        logging.getLogger().addFilter(ProgressLineFilter())
+    if progress_mode != 'off':
+        file_sizes = [os.path.getsize(eaf_file) for eaf_file in args.eaf_files]
+        progress = ProgressReporter(file_sizes, progress_mode,
+                                    interval = args.progress_interval)
+
+    # ==========================================================================
+    # Start processing EAF files
+    # --------------------------------------------------------------------------
+    # Results may arrive out of order (with `--jobs`), but they are always
+    # written in the order the files were given
+    pending = dict()
+    next_index = 0
+    run_stats = defaultdict(int)
+    recording_count = 0
+    for (index, result) in process_files(args.eaf_files, args, ignored_tiers):
+        (file_id, recordings, stats, elapsed) = result
+        if progress:
+            progress.update(file_id, file_sizes[index], stats, elapsed)
+        for (key, value) in stats.items():
+            run_stats[key] += value
+
+        pending[index] = recordings
+        while next_index in pending:
+            recordings = pending.pop(next_index)
+            next_index += 1
+            for (file_id, rows, records, overlap) in recordings:
+                recording_count += 1
+                for row in rows:
+                    output.writerow(row)
+
+                # Write the pairwise overlap table rows
+                if overlap is not None:
+                    for row in overlap.matrix_rows(file_id):
+                        overlap_output.writerow(row)
+                    grand_overlap.merge(overlap)
+
+                # Update the Grand Totals data for the set of EAF files being processed
+                if args.totals and records is not None:
+                    totals = records['totals']
+                    for category in totals.data.keys():
+                        grand_totals.data[category] += totals.data[category]
+
+                # Add the file's rows to each of the groups it belongs to
+                if groupings:
+                    if file_id not in manifest:
+                        logging.warning('File %s not found in manifest', file_id)
+                        continue
+                    file_summary = GroupAccumulator(data_labels = data_labels)
+                    file_summary.add_records(records or {})
+                    for grouping in groupings:
+                        key = ('+'.join(grouping),
+                               '/'.join(manifest[file_id][c] for c in grouping))
+                        if key not in groups:
+                            groups[key] = GroupAccumulator(*key, data_labels = data_labels)
+                        groups[key].merge(file_summary)
+
+    if progress:
+        progress.finish()
+
+    if args.bridge_gaps or args.min_duration:
+        logging.info('Bridged {:,} gaps, merged {:,} overlapping segments, and '
+                     'dropped {:,} short segments'.format(
+                         run_stats['bridged'], run_stats['overlapping'],
+                         run_stats['dropped']))
+
+    # --------------------------------------------------------------------------
+    # Finally, write the Grand Totals row if multiple files (or recordings) were
+    # processed
+    if args.totals and recording_count > 1:
+        output.writerow(grand_totals.fmt(data_labels))
+    args.output.close()
+
+    if args.overlap_matrix:
+        if args.totals and recording_count > 1:
+            for row in grand_overlap.matrix_rows('*'):
+                overlap_output.writerow(row)
+        args.overlap_matrix.close()
+
+    # Write the group table, one grouping at a time (just the header, if there
+    # are no groupings but a file was given for it)
+    if groupings or args.group_output is not None:
+        group_output = args.group_output
+        if group_output is None:
+            (base, extension) = os.path.splitext(args.output.name)
+            if base.startswith('<'):
+                base = 'eaf-counts'
+            group_output = open(base + '-groups' + (extension or '.csv'), 'w')
+        writer = csv.writer(group_output,
+                            delimiter      = output_delimiter,
+                            quoting        = csv.QUOTE_MINIMAL,
+                            lineterminator = '\n')
+        writer.writerow(GroupAccumulator.get_header(header))
+        for key in sorted(groups.keys(),
+                          key = lambda k: (groupings.index(k[0].split('+')), k[1])):
+            for row in groups[key].fmt():
+                writer.writerow(row)
+        group_output.close()
 
-exit
+# ------------------------------------------------------------------------------
+if __name__ == '__main__':
+    main()